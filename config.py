@@ -1,4 +1,4 @@
-from typing import NamedTuple
+from typing import List, NamedTuple
 
 from yaml import safe_load
 
@@ -11,6 +11,13 @@ __all__ = (
     "finnhub_key",
     "nasa_key",
     "perspective_key",
+    "cluster",
+    "gateway",
+    "lazy_extensions",
+    "member_cache",
+    "message_cache",
+    "offload",
+    "database",
 )
 
 with open("config.yml") as f:
@@ -19,8 +26,59 @@ with open("config.yml") as f:
 token = _config["token"]
 prefix = _config["prefix"]
 postgres_uri = _config["postgres_uri"]
+lazy_extensions = _config.get("lazy_extensions", False)
 
 _keys = _config["keys"]
+_cluster = _config.get("cluster") or {}
+_gateway = _config.get("gateway") or {}
+_member_cache = _config.get("member_cache") or {}
+_message_cache = _config.get("message_cache") or {}
+_offload = _config.get("offload") or {}
+_database = _config.get("database") or {}
+
+cluster = NamedTuple("Cluster", [("clusters", int), ("ipc_port", int)])(
+    _cluster.get("clusters"), _cluster.get("ipc_port", 8765)
+)
+gateway = NamedTuple(
+    "Gateway", [("resume", bool), ("session_max_age", float), ("skip_unused", bool), ("events", List[str])]
+)(
+    _gateway.get("resume", False),
+    _gateway.get("session_max_age", 120.0),
+    _gateway.get("skip_unused", False),
+    _gateway.get("events") or [],
+)
+member_cache = NamedTuple("MemberCache", [("policy", str), ("minutes", int)])(
+    _member_cache.get("policy", "all"), _member_cache.get("minutes", 30)
+)
+message_cache = NamedTuple("MessageCache", [("max_mb", float), ("per_channel", int)])(
+    _message_cache.get("max_mb", 8.0), _message_cache.get("per_channel", 50)
+)
+offload = NamedTuple("Offload", [("threads", int), ("processes", int)])(
+    _offload.get("threads", 4), _offload.get("processes", 0)
+)
+# the fields are keyword arguments of utils.db.create_pool
+database = NamedTuple(
+    "Database",
+    [
+        ("slow_query_ms", float),
+        ("cache_mb", float),
+        ("min_size", int),
+        ("max_size", int),
+        ("target_wait_ms", float),
+        ("replicas", List[str]),
+        ("max_lag", float),
+        ("pgbouncer", bool),
+    ],
+)(
+    _database.get("slow_query_ms", 250.0),
+    _database.get("cache_mb", 4.0),
+    _database.get("min_size", 2),
+    _database.get("max_size", 20),
+    _database.get("target_wait_ms", 50.0),
+    _database.get("replicas") or [],
+    _database.get("max_lag", 5.0),
+    _database.get("pgbouncer", False),
+)
 
 osu = NamedTuple("Osu", [("client_id", int), ("client_secret", int)])(
     _keys["osu"]["client_id"], _keys["osu"]["client_secret"]
@@ -31,4 +89,4 @@ finnhub_key = _keys["finnhub_key"]
 nasa_key = _keys["nasa_key"]
 perspective_key = _keys["perspective_key"]
 
-del _config, _keys
+del _config, _keys, _cluster, _gateway, _member_cache, _message_cache, _offload, _database
@@ -1,17 +1,25 @@
+from typing import Optional
+
 from discord.ext import commands
 
 from .bot import Bot
+from .cache import CacheSpec, cached
 from .context import Context
 
-__all__ = ("command", "group", "CustomBot", "CustomContext")
+__all__ = ("command", "group", "CacheSpec", "CustomBot", "CustomContext")
 
 
 class CommandMixin:
     def __init__(self, func, name, **attrs):
+        self.cache: Optional[CacheSpec] = attrs.pop("cache", None)
+        if self.cache is not None:
+            func = cached(func, self.cache)
         super().__init__(func, name=name, **attrs)
         self.examples: tuple = attrs.pop("examples", (None,))
         self.params_: dict = attrs.pop("params", "This command takes no parameters")
         self.returns: str = attrs.pop("returns", "I guess nothing?")
+        # whether ctx.db runs everything in one transaction
+        self.transaction: bool = attrs.pop("transaction", False)
 
 
 class Command(CommandMixin, commands.Command):
@@ -0,0 +1,142 @@
+import logging
+from typing import Dict, Optional, Set
+
+from discord.ext import commands
+
+__all__ = ("Blocked", "DisabledHere", "AccessManager")
+
+log = logging.getLogger(__name__)
+
+# commands of these cogs can't be disabled, or nobody could enable anything again
+PROTECTED_COGS = ("Settings",)
+
+
+class Blocked(commands.CheckFailure):
+    pass
+
+
+class DisabledHere(commands.CheckFailure):
+    def __init__(self, command: commands.Command) -> None:
+        self.command = command
+        super().__init__(f"`{command.qualified_name}` is disabled in this server.")
+
+
+class AccessManager:
+    """In-memory blocklist and per-guild disabled commands, backed by ``public.blocklist`` and
+    ``public.disabled_commands``.
+
+    Every command gets an ordinal from the sorted qualified names of ``bot.walk_commands()``, and each
+    guild keeps an int with the bits of its disabled commands set. Checking a command is one ``&`` with
+    the mask of the command and its parents. The ordinals are rebuilt whenever commands change.
+    """
+
+    def __init__(self, bot) -> None:
+        self.bot = bot
+        self.users: Set[int] = set()
+        self.guilds: Set[int] = set()
+
+        self._disabled: Dict[int, Set[str]] = {}
+        self._ordinals: Dict[str, int] = {}
+        self._masks: Dict[str, int] = {}
+        self._bits: Dict[int, int] = {}
+        self.stale = True
+
+    def _reindex(self) -> None:
+        names = sorted({command.qualified_name for command in self.bot.walk_commands()})
+        self._ordinals = ordinals = {name: i for i, name in enumerate(names)}
+
+        self._masks = {}
+        for command in self.bot.walk_commands():
+            mask = 0
+            for cmd in (command, *command.parents):
+                mask |= 1 << ordinals[cmd.qualified_name]
+            self._masks[command.qualified_name] = mask
+
+        self._bits = {}
+        for guild_id in self._disabled:
+            self._rebuild(guild_id)
+        self.stale = False
+
+    def _rebuild(self, guild_id: int) -> None:
+        disabled = self._disabled.get(guild_id)
+        if not disabled:
+            self._bits.pop(guild_id, None)
+            return
+        self._bits[guild_id] = sum(1 << self._ordinals[name] for name in disabled if name in self._ordinals)
+
+    def is_disabled(self, guild_id: Optional[int], command: commands.Command) -> bool:
+        if guild_id not in self._disabled:
+            return False
+        if self.stale:
+            self._reindex()
+        return bool(self._bits.get(guild_id, 0) & self._masks.get(command.qualified_name, 0))
+
+    def disabled(self, guild_id: int) -> Set[str]:
+        return self._disabled.get(guild_id, set())
+
+    async def check(self, ctx: commands.Context) -> bool:
+        """The global check, only looks at memory."""
+        if ctx.author.id == self.bot.owner_id:
+            return True
+
+        guild_id = getattr(ctx.guild, "id", None)
+        if ctx.author.id in self.users or guild_id in self.guilds:
+            raise Blocked()
+        if self.is_disabled(guild_id, ctx.command):
+            raise DisabledHere(ctx.command)
+        return True
+
+    async def load(self) -> None:
+        rows = await self.bot.pool.fetch("SELECT snowflake, guild FROM public.blocklist", primary=True)
+        self.users = {row["snowflake"] for row in rows if not row["guild"]}
+        self.guilds = {row["snowflake"] for row in rows if row["guild"]}
+
+        rows = await self.bot.pool.fetch(
+            "SELECT id, ARRAY_AGG(command) AS commands FROM public.disabled_commands GROUP BY id", primary=True
+        )
+        self._disabled = {row["id"]: set(row["commands"]) for row in rows}
+        self.stale = True
+        log.info(
+            f"Loaded {len(self.users)} blocked users, {len(self.guilds)} blocked guilds "
+            f"and disabled commands for {len(self._disabled)} guilds."
+        )
+
+    async def block(self, snowflake: int, *, guild: bool = False, reason: Optional[str] = None) -> None:
+        await self.bot.pool.execute(
+            "INSERT INTO public.blocklist (snowflake, guild, reason) VALUES ($1, $2, $3) "
+            "ON CONFLICT (snowflake) DO UPDATE SET guild = $2, reason = $3",
+            snowflake,
+            guild,
+            reason,
+        )
+        (self.guilds if guild else self.users).add(snowflake)
+
+    async def unblock(self, snowflake: int) -> None:
+        await self.bot.pool.execute("DELETE FROM public.blocklist WHERE snowflake = $1", snowflake)
+        self.users.discard(snowflake)
+        self.guilds.discard(snowflake)
+
+    async def disable(self, guild_id: int, command: commands.Command) -> None:
+        if command.cog_name in PROTECTED_COGS:
+            raise commands.BadArgument(f"`{command.qualified_name}` can't be disabled.")
+
+        async with self.bot.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("INSERT INTO public.guilds (id) VALUES ($1) ON CONFLICT DO NOTHING", guild_id)
+                await conn.execute(
+                    "INSERT INTO public.disabled_commands (id, command) VALUES ($1, $2) ON CONFLICT DO NOTHING",
+                    guild_id,
+                    command.qualified_name,
+                )
+        self._disabled.setdefault(guild_id, set()).add(command.qualified_name)
+        self._rebuild(guild_id)
+
+    async def enable(self, guild_id: int, command: commands.Command) -> None:
+        await self.bot.pool.execute(
+            "DELETE FROM public.disabled_commands WHERE id = $1 AND command = $2", guild_id, command.qualified_name
+        )
+        disabled = self._disabled.get(guild_id, set())
+        disabled.discard(command.qualified_name)
+        if not disabled:
+            self._disabled.pop(guild_id, None)
+        self._rebuild(guild_id)
@@ -1,40 +1,87 @@
+import asyncio
 import logging
+import sys
+import time
 from asyncio import AbstractEventLoop, Event
 from collections import Counter, deque
 from random import SystemRandom
 from statistics import mean
-from typing import List, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import discord
+import psutil
 from aiohttp import ClientSession
 from discord.ext import commands
+from discord.gateway import DiscordWebSocket
+from discord.shard import Shard
 
 import config
 
+from .access import AccessManager
+from .cache import ResponseCache
+from .lazy import LazyLoader
+from .members import MemberCache
+from .offload import Offloader
+from .outbound import Outbox
+from .prefixes import PrefixManager
+from .resolver import Resolver
+from .sessions import SessionStore, dump_guild, dump_user, restore_guilds
+from .snapshot import load_snapshot, save_snapshot
+from .state import CachedConnectionState, MessageCache, ParserTable, cache_events
+from .supervisor import Supervisor
+from .waiters import WaiterRegistry
+
 __all__ = ("CustomBot",)
 
 log = logging.getLogger(__name__)
 
 
-def get_prefix(bot: "Bot", message: discord.Message) -> Union[List[str], str]:
-    return commands.when_mentioned_or(*config.prefix)(bot, message)
+def get_prefix(bot: "Bot", message: discord.Message) -> Union[Tuple[str, ...], str]:
+    return bot.prefixes.resolve(getattr(message.guild, "id", None), message.content)
 
 
 class Extra:
     def __init__(self):
         self.message_latencies = deque(maxlen=500)
+        self.since = discord.utils.utcnow()
         self.socket_stats = Counter()
         self.command_stats = Counter()
 
+        # all time totals are the database totals from before any running process counted (the
+        # baseline), plus what every process counted since, see Bot.totals
+        self.socket_baseline = Counter()
+        self.commands_baseline = 0
+        self.socket_totals = Counter()
+        self.commands_total = 0
+        # counted, but not written to the database yet
+        self.socket_pending = Counter()
+        # written already, so a cluster starting later can take them out of its baseline
+        self.socket_flushed = Counter()
+        self.commands_flushed = 0
+
+        self.known_guilds = set()
+        self.cog_metadata = {}
+        # whether this was restored from a snapshot
+        self.warm = False
+
     @property
     def message_latency(self):
         return 1000 * mean(lat.total_seconds() for lat in self.message_latencies)
 
 
-class Bot(commands.Bot):
+class Bot(commands.AutoShardedBot):
     loop: AbstractEventLoop
+    # how long each shutdown stage may wait for work in flight
+    shutdown_timeout = 10.0
 
-    def __init__(self, loop: AbstractEventLoop) -> None:
+    def __init__(
+        self,
+        loop: AbstractEventLoop,
+        *,
+        shard_ids: Optional[List[int]] = None,
+        shard_count: Optional[int] = None,
+        cluster_id: Optional[int] = None,
+    ) -> None:
         intents = discord.Intents.default()
         intents.members = True
         super().__init__(
@@ -42,9 +89,13 @@ class Bot(commands.Bot):
             skip_after_prefix=True,
             case_insensitive=True,
             intents=intents,
-            max_messages=750,
+            chunk_guilds_at_startup=config.member_cache.policy == "all",
+            # the real limits are enforced by the MessageCache, see _get_state
+            max_messages=sys.maxsize,
             owner_id=809587169520910346,
             loop=loop,
+            shard_ids=shard_ids,
+            shard_count=shard_count,
         )
 
         self.loop.create_task(self.__prep())
@@ -52,22 +103,149 @@ class Bot(commands.Bot):
 
         self.random = SystemRandom()
         self.extra = Extra()
+        self.snapshot_path = "data/snapshot.bin" if cluster_id is None else f"data/snapshot-{cluster_id}.bin"
+        load_snapshot(self, self.snapshot_path)
         self.start_time = None
 
         self.categories = {"private": {}, "public": {}}
+        self.prefixes = PrefixManager(self)
+        self.access = AccessManager(self)
+        self.add_check(self.access.check)
+        self.resolver = Resolver(self)
+        self.outbox = Outbox()
+        self.waiters = WaiterRegistry(self)
+        self.responses = ResponseCache()
+        self.supervisor = Supervisor(self)
+        self.offload = Offloader(threads=config.offload.threads, processes=config.offload.processes)
+        self.members = MemberCache(self, policy=config.member_cache.policy, minutes=config.member_cache.minutes)
+
+        self.cluster_id = cluster_id
+        self.ipc = None
+
+        self.sessions = None
+        if config.gateway.resume:
+            path = "data/sessions.json" if cluster_id is None else f"data/sessions-{cluster_id}.json"
+            self.sessions = SessionStore(path, max_age=config.gateway.session_max_age)
+        self._cold_resumes = set()
+
+        self.closing = False
+        self._invocations = set()
+
+        # state exported by cogs being reloaded, see remove_cog
+        self._cog_states: Dict[str, dict] = {}
+
+        self.lazy = LazyLoader(self) if config.lazy_extensions else None
+        self.extension_costs: Dict[str, Tuple[float, float]] = {}
 
         self.context = commands.Context
+        self._refresh_events()
+
+    def _get_state(self, **options) -> CachedConnectionState:
+        cache = MessageCache(
+            max_bytes=int(config.message_cache.max_mb * 1024 ** 2),
+            per_channel=config.message_cache.per_channel,
+        )
+        state = CachedConnectionState.adopt(super()._get_state(**options), cache)
+        always = cache_events(
+            messages=config.message_cache.max_mb > 0 and config.message_cache.per_channel > 0,
+            members=state.intents.members,
+        )
+        state.parsers = ParserTable(state.parsers, self.count_event, always | set(config.gateway.events))
+        return state
+
+    def _refresh_events(self) -> None:
+        """Lets the parser table skip the gateway events no listener, handler or wait_for needs."""
+        parsers = getattr(getattr(self, "_connection", None), "parsers", None)
+        if not config.gateway.skip_unused or not isinstance(parsers, ParserTable):
+            return
+        events = {name[3:] for name in self.extra_events}
+        events.update(self._listeners)
+        events.update(name[3:] for name in dir(type(self)) if name.startswith("on_"))
+        parsers.listen(events)
+
+    def add_listener(self, func, name=None) -> None:
+        super().add_listener(func, name)
+        self._refresh_events()
+
+    def remove_listener(self, func, name=None) -> None:
+        super().remove_listener(func, name)
+        self._refresh_events()
+
+    def wait_for(self, event, *, check=None, timeout=None):
+        waiting = super().wait_for(event, check=check, timeout=timeout)
+        self._refresh_events()
+        return waiting
+
+    def count_event(self, event: str) -> None:
+        extra = self.extra
+        extra.socket_stats[event] += 1
+        extra.socket_totals[event] += 1
+        extra.socket_pending[event] += 1
+
+    @property
+    def messages(self) -> MessageCache:
+        return self._connection.message_cache
 
     async def __prep(self):
         self.session = ClientSession(headers={"User-Agent": "Walrus (https://github.com/ppotatoo/bot-rewrite)"})
+        # the pool is only assigned after __init__, it is there by the time we are ready
         await self.wait_until_ready()
-        async with self.pool.acquire() as conn:
-            await conn.executemany(
-                "INSERT INTO public.guilds (id) VALUES ($1) ON CONFLICT DO NOTHING",
-                tuple((g.id,) for g in self.guilds),
-            )
-        self.prepped.set()
-        log.info("Completed preperation.")
+        try:
+            if not self.extra.warm:
+                await self.load_baseline()
+
+            guild_ids = {g.id for g in self.guilds}
+            if new := guild_ids - self.extra.known_guilds:
+                await self.pool.executemany(
+                    "INSERT INTO public.guilds (id) VALUES ($1) ON CONFLICT DO NOTHING",
+                    tuple((g,) for g in new),
+                )
+            self.extra.known_guilds |= guild_ids
+        except Exception:
+            log.exception("Preperation failed.")
+        else:
+            log.info("Completed preperation.")
+        finally:
+            # whatever happened, the stats buffers still have to be flushed
+            self.prepped.set()
+
+    async def load_baseline(self) -> None:
+        extra = self.extra
+        commands_total = await self.pool.fetchval("SELECT COUNT(*) FROM stats.commands")
+        socket = Counter(dict(await self.pool.fetch("SELECT name, count FROM stats.socket")))
+        # the other clusters count what they flushed in their own totals already
+        for data in (await self._other_clusters()).values():
+            commands_total -= data["totals"]["commands_flushed"]
+            socket.subtract(data["totals"]["socket_flushed"])
+        extra.commands_baseline = commands_total
+        extra.socket_baseline = +socket
+
+    def add_cog(self, cog: commands.Cog, **kwargs) -> None:
+        # the metadata might come from a snapshot of older code
+        self.extra.cog_metadata.pop(cog.qualified_name, None)
+        super().add_cog(cog, **kwargs)
+
+        state = self._cog_states.pop(cog.qualified_name, None)
+        if state is not None and hasattr(cog, "import_state"):
+            cog.import_state(state)
+            log.info(f"Handed state over to the new {cog.qualified_name} cog.")
+
+    def remove_cog(self, name: str) -> None:
+        self.extra.cog_metadata.pop(name, None)
+        cog = self.get_cog(name)
+        super().remove_cog(name)
+
+        # exported after cog_unload, so the cog can stop its tasks first
+        if cog is not None and hasattr(cog, "export_state"):
+            self._cog_states[name] = cog.export_state()
+
+    def add_command(self, command: commands.Command) -> None:
+        super().add_command(command)
+        self.access.stale = True
+
+    def remove_command(self, name: str) -> Optional[commands.Command]:
+        self.access.stale = True
+        return super().remove_command(name)
 
     def add_category(self, name: str, cogs: List[commands.Cog], *, path="public", emoji: str = None) -> None:
         assert path in ("private", "public"), "Path must be private or public"
@@ -80,42 +258,215 @@ class Bot(commands.Bot):
 
         self.categories[path].update(data)
 
+    def load_extension(self, name: str, *, package: str = None) -> None:
+        process = psutil.Process()
+        rss = process.memory_info().rss
+        start = time.perf_counter()
+
+        super().load_extension(name, package=package)
+
+        elapsed = (time.perf_counter() - start) * 1000
+        delta = (process.memory_info().rss - rss) / 1024 ** 2
+        self.extension_costs[name] = (elapsed, delta)
+        log.info(f"Loaded {name} in {elapsed:.2f}ms ({delta:+.2f} MiB)")
+
     def load_extensions(self):
+        # (name, whether it can wait until it is first used)
         extensions = (
-            "core.context",
-            "extensions.internal",
-            "extensions.internal.help",
-            "extensions.games",
-            "extensions.interactions",
-            "extensions.reminders",
-            "extensions.general",
-            "extensions.owner",
-            "extensions.casino",
-            "extensions.useful",
-            "extensions.giveaways",
+            ("core.context", False),
+            ("extensions.internal", False),
+            ("extensions.internal.help", False),
+            ("extensions.games", True),
+            ("extensions.interactions", True),
+            ("extensions.reminders", False),
+            ("extensions.general", True),
+            ("extensions.owner", True),
+            ("extensions.casino", True),
+            ("extensions.useful", True),
+            ("extensions.giveaways", True),
+            ("extensions.settings", True),
+            ("jishaku", True),
         )
-        for ext in extensions:
+        deferred = []
+        for ext, lazy in extensions:
+            if lazy and self.lazy is not None and self.lazy.defer(ext):
+                deferred.append(ext)
+                continue
             self.load_extension(ext)
-        self.load_extension("jishaku")
-        log.info("Loaded extensions")
+            if self.lazy is not None:
+                self.lazy.record(ext)
+
+        if self.lazy is not None:
+            self.lazy.save()
+            log.info(f"Deferred loading {len(deferred)} extensions: {', '.join(deferred)}")
+
+        total = sum(ms for ms, _ in self.extension_costs.values())
+        log.info(f"Loaded {len(self.extension_costs)} extensions in {total:.2f}ms")
 
     async def get_context(self, message, *, cls=None):
         return await super().get_context(message, cls=cls or self.context)
 
     async def login(self, token: str):
         await super().login(token)
+        await self.prefixes.load()
+        await self.access.load()
+        self.supervisor.register("pool_sizing", self.pool.adjust, interval=5)
+        if self.pool.replicas:
+            self.supervisor.register("replica_health", self.pool.check_replicas, interval=10)
         self.start_time = discord.utils.utcnow()
 
     def run(self, *args, **kwargs):
         self.load_extensions()
         super().run(*args, **kwargs)
 
-    async def close(self):
+    def _shard_handles(self) -> Dict[int, Shard]:
+        return self._AutoShardedClient__shards
+
+    async def launch_shard(self, gateway: str, shard_id: int, *, initial: bool = False) -> None:
+        session = self.sessions.pop(shard_id, self.shard_count) if self.sessions is not None else None
+        if session is None:
+            return await super().launch_shard(gateway, shard_id, initial=initial)
+
+        # before resuming, so the replayed events find their guilds
+        start = time.perf_counter()
+        count = restore_guilds(self._connection, self.sessions.user, session["guilds"])
+        log.info(f"Restored {count} guilds of shard {shard_id} in {time.perf_counter() - start:.2f}s.")
+
+        try:
+            coro = DiscordWebSocket.from_client(
+                self,
+                gateway=session["gateway"],
+                shard_id=shard_id,
+                session=session["session_id"],
+                sequence=session["sequence"],
+                resume=True,
+            )
+            ws = await asyncio.wait_for(coro, timeout=180.0)
+        except Exception:
+            log.exception(f"Failed to resume shard {shard_id}, identifying instead.")
+            return await super().launch_shard(gateway, shard_id, initial=initial)
+
+        # if discord rejects the session the shard falls back to IDENTIFY on its own
+        self._cold_resumes.add(shard_id)
+        self._shard_handles()[shard_id] = shard = Shard(ws, self, self._AutoShardedClient__queue.put_nowait)
+        shard.launch()
+
+    async def on_shard_connect(self, shard_id: int):
+        self._cold_resumes.discard(shard_id)
+
+    async def on_shard_resumed(self, shard_id: int):
+        if shard_id not in self._cold_resumes:
+            return
+
+        self._cold_resumes.discard(shard_id)
+        log.info(f"Shard {shard_id} resumed its old session.")
+
+        if not self._cold_resumes and not self.is_ready() and self._connection._ready_task is None:
+            self._connection.call_handlers("ready")
+            self.dispatch("ready")
+
+    async def process_commands(self, message: discord.Message) -> None:
+        if self.closing:
+            return
+        await super().process_commands(message)
+
+    async def invoke(self, ctx: commands.Context) -> None:
+        task = asyncio.current_task()
+        self._invocations.add(task)
+        try:
+            await super().invoke(ctx)
+        finally:
+            self._invocations.discard(task)
+            # ctx.db, committed unless the command failed
+            if hasattr(ctx, "release_db"):
+                await ctx.release_db()
+
+    async def _wait_for_commands(self) -> None:
+        # close may be called by a command, which would otherwise wait on itself
+        running = self._invocations - {asyncio.current_task()}
+        if running:
+            _, pending = await asyncio.wait(running, timeout=self.shutdown_timeout)
+            if pending:
+                log.warning(f"Shutting down with {len(pending)} commands still running.")
+
+    async def _stop_tasks(self) -> None:
+        await self.supervisor.close(self.shutdown_timeout)
+
+    async def _flush_buffers(self) -> None:
+        for cog in tuple(self.cogs.values()):
+            if hasattr(cog, "flush"):
+                await cog.flush()
+
+    async def _drain_timers(self) -> None:
+        if (reminders := self.get_cog("Reminders")) is None:
+            return
+        try:
+            await asyncio.wait_for(reminders.stop(), timeout=self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            # its lease runs out, and it is delivered again
+            log.warning("Shutting down with a timer delivery still running.")
+
+    async def _stop_api(self) -> None:
+        if (api := self.get_cog("BackendAPI")) is not None:
+            await api.api.close()
+
+    async def _drain_outbox(self) -> None:
+        if not await self.outbox.drain(self.shutdown_timeout):
+            log.warning("Shutting down with messages still queued.")
+
+    async def _close_gateway(self) -> None:
+        # closed here either way, so nothing gets counted or buffered after the flush
+        shards = self._shard_handles().values()
+        if self.sessions is not None and self.user is not None:
+            guilds = {}
+            for guild in self.guilds:
+                if not guild.unavailable:
+                    guilds.setdefault(guild.shard_id, []).append(dump_guild(guild))
+            self.sessions.save(
+                self.shard_count, (shard.ws for shard in shards), user=dump_user(self.user), guilds=guilds
+            )
+        for shard in shards:
+            shard._cancel_task()
+            # closing with 1000 would invalidate the session
+            await shard.ws.close(code=1000 if self.sessions is None else 4000)
+
+    async def _save_snapshot(self) -> None:
+        save_snapshot(self, self.snapshot_path)
+
+    async def _close_connections(self) -> None:
         await self.session.close()
         await self.pool.close()
+        self.offload.shutdown()
+
+    async def close(self):
+        if self.closing or self.is_closed():
+            return
+        self.closing = True
+
+        stages = (
+            ("commands", self._wait_for_commands),
+            ("tasks", self._stop_tasks),
+            ("timers", self._drain_timers),
+            ("api", self._stop_api),
+            ("outbox", self._drain_outbox),
+            ("gateway", self._close_gateway),
+            # after everything that can still produce rows, the pool is closed right after
+            ("buffers", self._flush_buffers),
+            ("snapshot", self._save_snapshot),
+            ("connections", self._close_connections),
+        )
+        for name, stage in stages:
+            start = time.perf_counter()
+            try:
+                await stage()
+            except Exception:
+                log.exception(f"Shutdown stage {name} failed.")
+            log.info(f"Shutdown stage {name} took {time.perf_counter() - start:.2f}s.")
+
         await super().close()
 
     async def on_ready(self):
+        self.prefixes.invalidate()
         log.info("Connected to Discord.")
 
     @staticmethod
@@ -129,8 +480,59 @@ class Bot(commands.Bot):
         key = res["key"]
         return url + f"/{key}"
 
+    def local_stats(self) -> Dict[str, int]:
+        # no bot/human split, that would mean walking every cached member (only the recent ones under
+        # the "recent" policy), member_count is kept up to date by discord.py
+        data = {"guilds": 0, "users": len(self.users), "members": 0, "text": 0, "voice": 0}
+        for guild in self.guilds:
+            data["guilds"] += 1
+            if guild.unavailable:
+                continue
+
+            data["members"] += guild.member_count or 0
+
+            for channel in guild.channels:
+                if isinstance(channel, discord.TextChannel):
+                    data["text"] += 1
+                elif isinstance(channel, discord.VoiceChannel):
+                    data["voice"] += 1
+
+        return data
+
+    def local_totals(self) -> dict:
+        """What this process counted towards the all time totals, published to the other clusters."""
+        extra = self.extra
+        return {
+            "commands": extra.commands_total,
+            "socket": dict(extra.socket_totals),
+            "commands_flushed": extra.commands_flushed,
+            "socket_flushed": dict(extra.socket_flushed),
+        }
+
+    async def _other_clusters(self) -> Dict[int, dict]:
+        if self.ipc is None:
+            return {}
+        return {
+            cluster_id: data for cluster_id, data in (await self.ipc.stats()).items() if cluster_id != self.cluster_id
+        }
+
+    async def cluster_stats(self) -> Dict[str, int]:
+        """Stats summed over every cluster, or just this process when not clustered."""
+        local = self.local_stats()
+        total = Counter(local)
+        for data in (await self._other_clusters()).values():
+            total.update(data["stats"])
+        return {key: total[key] for key in local}
+
+    async def totals(self) -> Tuple[int, Counter]:
+        """All time commands run and gateway events, over every cluster."""
+        extra = self.extra
+        commands_total = extra.commands_baseline + extra.commands_total
+        socket = extra.socket_baseline + extra.socket_totals
+        for data in (await self._other_clusters()).values():
+            commands_total += data["totals"]["commands"]
+            socket.update(data["totals"]["socket"])
+        return commands_total, socket
+
     async def getch_user(self, user_id: int) -> discord.User:
-        user = self.get_user(user_id)
-        if user is None:
-            user = await self.fetch_user(user_id)
-        return user
+        return await self.resolver.user(user_id)
@@ -0,0 +1,119 @@
+import functools
+import logging
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from discord.ext import commands
+
+__all__ = ("CacheSpec", "ResponseCache", "cached")
+
+log = logging.getLogger(__name__)
+
+SCOPES = ("global", "guild", "channel", "user")
+
+
+class CacheSpec(NamedTuple):
+    ttl: float
+    scope: str = "global"
+    max_entries: int = 128
+
+
+class ResponseCache:
+    """Keeps the messages a command sent, so they can be sent again instead of running the command.
+
+    Entries are keyed by the scope of the :class:`CacheSpec` and the arguments of the command.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, "OrderedDict[Hashable, Tuple[float, List[dict]]]"] = {}
+        self.hits = Counter()
+        self.misses = Counter()
+
+    @staticmethod
+    def key(ctx: commands.Context, spec: CacheSpec) -> Hashable:
+        scope = {
+            "global": None,
+            "guild": getattr(ctx.guild, "id", None),
+            "channel": ctx.channel.id,
+            "user": ctx.author.id,
+        }[spec.scope]
+        args = ctx.args[2:] if ctx.command.cog is not None else ctx.args[1:]
+        # discord models are compared by id, which is all that matters here
+        args = tuple(getattr(arg, "id", arg) for arg in args)
+        kwargs = tuple((name, getattr(arg, "id", arg)) for name, arg in ctx.kwargs.items())
+        return scope, args, kwargs
+
+    def get(self, name: str, key: Hashable) -> Optional[List[dict]]:
+        entries = self._entries.get(name)
+        entry = entries.get(key) if entries is not None else None
+        if entry is None or entry[0] < time.monotonic():
+            self.misses[name] += 1
+            return None
+
+        entries.move_to_end(key)
+        self.hits[name] += 1
+        return entry[1]
+
+    def set(self, name: str, key: Hashable, spec: CacheSpec, payloads: List[dict]) -> None:
+        entries = self._entries.setdefault(name, OrderedDict())
+        entries[key] = (time.monotonic() + spec.ttl, payloads)
+        entries.move_to_end(key)
+        while len(entries) > spec.max_entries:
+            entries.popitem(last=False)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Drops the cached responses of a command, or of every command."""
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {"hits": self.hits[name], "misses": self.misses[name], "entries": len(self._entries.get(name, ()))}
+            for name in self.hits.keys() | self.misses.keys()
+        }
+
+
+def cached(func, spec: CacheSpec):
+    """Wraps a command callback, replaying the messages of an earlier invocation while they are fresh.
+
+    Invocations that send files or views are not cached, those can't be sent twice.
+    """
+    if spec.scope not in SCOPES:
+        raise ValueError(f"Unknown cache scope {spec.scope!r}")
+    if getattr(func, "__cache_spec__", None) is not None:
+        # commands get copied with their wrapped callback
+        return func
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any):
+        ctx = args[0] if isinstance(args[0], commands.Context) else args[1]
+        if not hasattr(ctx, "recorded"):
+            return await func(*args, **kwargs)
+
+        cache: ResponseCache = ctx.bot.responses
+        name = ctx.command.qualified_name
+        key = cache.key(ctx, spec)
+        try:
+            hash(key)
+        except TypeError:
+            return await func(*args, **kwargs)
+
+        payloads = cache.get(name, key)
+        if payloads is not None:
+            for payload in payloads:
+                await ctx.send(**payload)
+            return
+
+        ctx.recorded = []
+        try:
+            await func(*args, **kwargs)
+            if ctx.recorded is not None:
+                cache.set(name, key, spec, ctx.recorded)
+        finally:
+            ctx.recorded = None
+
+    wrapper.__cache_spec__ = spec
+    return wrapper
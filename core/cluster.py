@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import signal
+import sys
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from .ipc import IPCServer
+
+__all__ = ("ClusterLauncher", "split_shards")
+
+log = logging.getLogger(__name__)
+
+API_URL = "https://discord.com/api/v9"
+
+
+def split_shards(shard_count: int, clusters: int) -> List[List[int]]:
+    """Splits the shard ids into contiguous slices, so each cluster identifies in as few buckets as possible."""
+    clusters = max(1, min(clusters, shard_count))
+    size, extra = divmod(shard_count, clusters)
+    slices = []
+    start = 0
+    for i in range(clusters):
+        end = start + size + (i < extra)
+        slices.append(list(range(start, end)))
+        start = end
+    return slices
+
+
+async def fetch_shard_count(token: str) -> int:
+    headers = {"Authorization": f"Bot {token}"}
+    async with aiohttp.ClientSession(headers=headers) as session:
+        async with session.get(API_URL + "/gateway/bot") as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+    return data["shards"]
+
+
+class Cluster:
+    def __init__(self, launcher: "ClusterLauncher", cluster_id: int, shard_ids: List[int]):
+        self.launcher = launcher
+        self.id = cluster_id
+        self.shard_ids = shard_ids
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+
+    def args(self) -> List[str]:
+        return [
+            sys.argv[0],
+            "worker",
+            "--cluster-id",
+            str(self.id),
+            "--shard-ids",
+            ",".join(map(str, self.shard_ids)),
+            "--shard-count",
+            str(self.launcher.shard_count),
+            "--ipc-port",
+            str(self.launcher.ipc.port),
+        ]
+
+    async def supervise(self) -> None:
+        backoff = self.launcher.min_backoff
+        while not self.launcher.closing:
+            started = time.monotonic()
+            self.process = await asyncio.create_subprocess_exec(sys.executable, *self.args())
+            log.info(f"Started cluster {self.id} (pid {self.process.pid}) with shards {self.shard_ids}")
+
+            code = await self.process.wait()
+            self.launcher.ipc.forget(self.id)
+            if self.launcher.closing:
+                return
+
+            if time.monotonic() - started > self.launcher.max_backoff:
+                backoff = self.launcher.min_backoff
+            log.warning(f"Cluster {self.id} exited with code {code}, restarting in {backoff:.0f}s.")
+            self.restarts += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.launcher.max_backoff)
+
+    def terminate(self) -> None:
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+
+
+class ClusterLauncher:
+    """Spawns a process per cluster, each running an auto-sharded bot over a slice of the shards.
+
+    Clusters that exit get restarted with an exponential backoff, and an :class:`IPCServer` lets
+    them share stats with each other.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        *,
+        clusters: int,
+        shard_count: Optional[int] = None,
+        ipc_port: int = 8765,
+        min_backoff: float = 5.0,
+        max_backoff: float = 60.0,
+    ):
+        self.token = token
+        self.cluster_count = clusters
+        self.shard_count = shard_count
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self.ipc = IPCServer(port=ipc_port)
+        self.clusters: Dict[int, Cluster] = {}
+        self.closing = False
+
+    def close(self) -> None:
+        self.closing = True
+        for cluster in self.clusters.values():
+            cluster.terminate()
+
+    async def start(self) -> None:
+        if self.shard_count is None:
+            self.shard_count = await fetch_shard_count(self.token)
+
+        slices = split_shards(self.shard_count, self.cluster_count)
+        log.info(f"Launching {len(slices)} clusters for {self.shard_count} shards.")
+
+        await self.ipc.start()
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.close)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        self.clusters = {i: Cluster(self, i, shard_ids) for i, shard_ids in enumerate(slices)}
+        try:
+            await asyncio.gather(*(cluster.supervise() for cluster in self.clusters.values()))
+        finally:
+            self.close()
+            for cluster in self.clusters.values():
+                if cluster.process is not None:
+                    await cluster.process.wait()
+            await self.ipc.close()
+            log.info("All clusters have shut down.")
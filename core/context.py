@@ -1,12 +1,114 @@
+import asyncio
+from typing import List, Optional
+
+import asyncpg
+import discord
 from discord.ext import commands
 
 from . import Bot
+from .outbound import Priority
+
+__all__ = ("CustomContext", "LazyConnection", "setup", "teardown")
+
+
+class LazyConnection:
+    """A pool connection that is only acquired once a query runs, then kept until :meth:`release`.
+
+    With ``transaction`` every query runs in one transaction, committed on release unless told to roll
+    back. Like any connection, it can't run queries concurrently.
+
+    ``async with ctx.db:`` releases it at the end of the block (rolling back on an error), so HTTP
+    requests and sends after it don't hold a pool slot. A query after that acquires a new one.
+    """
+
+    def __init__(self, pool, *, transaction: bool = False) -> None:
+        self.pool = pool
+        self.transaction = transaction
+        self._connection: Optional[asyncpg.Connection] = None
+        self._transaction = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def acquired(self) -> bool:
+        return self._connection is not None
+
+    async def acquire(self) -> asyncpg.Connection:
+        async with self._lock:
+            if self._connection is None:
+                connection = await self.pool.acquire()
+                if self.transaction:
+                    self._transaction = connection.transaction()
+                    await self._transaction.start()
+                self._connection = connection
+        return self._connection
+
+    async def release(self, *, rollback: bool = False) -> None:
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            if self._transaction is not None:
+                if rollback:
+                    await self._transaction.rollback()
+                else:
+                    await self._transaction.commit()
+        finally:
+            self._transaction = None
+            await self.pool.release(connection)
+
+    async def __aenter__(self) -> "LazyConnection":
+        return self
 
-__all__ = ("CustomContext", "setup", "teardown")
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.release(rollback=exc_type is not None)
+
+    async def execute(self, query: str, *args, timeout: float = None) -> str:
+        return await (await self.acquire()).execute(query, *args, timeout=timeout)
+
+    async def executemany(self, command: str, args, *, timeout: float = None):
+        return await (await self.acquire()).executemany(command, args, timeout=timeout)
+
+    async def fetch(self, query, *args, timeout=None) -> list:
+        return await (await self.acquire()).fetch(query, *args, timeout=timeout)
+
+    async def fetchval(self, query, *args, column=0, timeout=None):
+        return await (await self.acquire()).fetchval(query, *args, column=column, timeout=timeout)
+
+    async def fetchrow(self, query, *args, timeout=None):
+        return await (await self.acquire()).fetchrow(query, *args, timeout=timeout)
+
+    async def call(self, name, *args, timeout=None):
+        return await (await self.acquire()).call(name, *args, timeout=timeout)
 
 
 class Context(commands.Context):
     bot: Bot
+    # the messages sent while a cached command runs, see core.cache
+    recorded: Optional[List[dict]] = None
+    _db: Optional[LazyConnection] = None
+
+    @property
+    def db(self) -> LazyConnection:
+        """One connection for the invocation, released by Bot.invoke if the command didn't already."""
+        if self._db is None:
+            self._db = LazyConnection(self.bot.pool, transaction=getattr(self.command, "transaction", False))
+        return self._db
+
+    async def release_db(self) -> None:
+        if self._db is not None:
+            await self._db.release(rollback=self.command_failed)
+
+    async def send(self, content=None, **kwargs):
+        if self.recorded is not None:
+            if kwargs.keys() & {"file", "files", "view"}:
+                self.recorded = None
+            else:
+                self.recorded.append(dict(kwargs, content=content))
+        return await self.bot.outbox.send(self, content, priority=Priority.INTERACTIVE, **kwargs)
+
+    async def wait_for_message(self, *, timeout: float = None, check=None) -> discord.Message:
+        """Waits for the next message of the author in this channel."""
+        return await self.bot.waiters.wait(self.channel.id, self.author.id, timeout=timeout, check=check)
 
 
 def setup(bot: Bot) -> None:
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Optional
+
+__all__ = ("IPCServer", "IPCClient")
+
+log = logging.getLogger(__name__)
+
+
+def _encode(payload: dict) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode() + b"\n"
+
+
+class IPCServer:
+    """Line delimited JSON server that runs in the cluster launcher.
+
+    Clusters ``publish`` their stats every so often and can ask for the ``stats`` of every cluster.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 8765) -> None:
+        self.host = host
+        self.port = port
+        self.stats: Dict[int, dict] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        log.info(f"IPC server listening on {self.host}:{self.port}")
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def forget(self, cluster_id: int) -> None:
+        self.stats.pop(cluster_id, None)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    payload = json.loads(line)
+                    if not isinstance(payload, dict):
+                        raise TypeError(f"expected an object, got {type(payload).__name__}")
+                    op = payload.get("op")
+                    if op == "publish":
+                        if not isinstance(payload["data"], dict):
+                            raise TypeError("publish data has to be an object")
+                        self.stats[int(payload["cluster"])] = payload["data"]
+                    elif op == "stats":
+                        writer.write(_encode({"clusters": self.stats}))
+                        await writer.drain()
+                # bad UTF-8 and JSON are ValueErrors too, only the payload is skipped
+                except (ValueError, KeyError, TypeError) as err:
+                    log.warning(f"Skipped a bad IPC payload: {err!r}")
+        # readline raises a ValueError for lines over the stream limit
+        except (ConnectionError, ValueError) as err:
+            log.warning(f"IPC connection dropped: {err!r}")
+        finally:
+            writer.close()
+
+
+class IPCClient:
+    """The cluster side of :class:`IPCServer`."""
+
+    def __init__(self, bot, *, cluster_id: int, host: str = "localhost", port: int = 8765, interval: float = 15.0):
+        self.bot = bot
+        self.cluster_id = cluster_id
+        self.host = host
+        self.port = port
+        self.interval = interval
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+        self.bot.loop.create_task(self.run())
+
+    async def _send(self, payload: dict) -> Optional[bytes]:
+        async with self._lock:
+            if self._writer is None or self._writer.is_closing():
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self._writer.write(_encode(payload))
+            await self._writer.drain()
+            if payload["op"] == "stats":
+                return await self._reader.readline()
+
+    def _reset(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def publish(self, data: dict) -> None:
+        await self._send({"op": "publish", "cluster": self.cluster_id, "data": data})
+
+    async def stats(self) -> Dict[int, dict]:
+        try:
+            line = await asyncio.wait_for(self._send({"op": "stats"}), timeout=5)
+        except (OSError, asyncio.TimeoutError) as err:
+            log.warning(f"Could not fetch cluster stats: {err!r}")
+            self._reset()
+            return {}
+        if not line:
+            self._reset()
+            return {}
+        return {int(k): v for k, v in json.loads(line)["clusters"].items()}
+
+    async def run(self) -> None:
+        await self.bot.wait_until_ready()
+        while not self.bot.is_closed():
+            try:
+                await self.publish({"stats": self.bot.local_stats(), "totals": self.bot.local_totals()})
+            except OSError as err:
+                log.warning(f"Could not publish cluster stats: {err!r}")
+                self._reset()
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List
+
+from discord.ext import commands
+
+__all__ = ("LazyLoader",)
+
+log = logging.getLogger(__name__)
+
+
+class LazyLoader:
+    """Defers importing extensions until one of their commands or listeners is needed.
+
+    Stubs are registered from a manifest of command names and listeners, which is written every time
+    an extension is actually loaded. Extensions missing from the manifest are loaded right away.
+    """
+
+    def __init__(self, bot, path: str = "data/extensions.json") -> None:
+        self.bot = bot
+        self.path = path
+        self.manifest: Dict[str, dict] = {}
+        self.pending: Dict[str, dict] = {}
+        self._listeners: Dict[str, List[tuple]] = {}
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def _cogs(self, name: str) -> List[commands.Cog]:
+        return [cog for cog in self.bot.cogs.values() if cog.__module__.startswith(name)]
+
+    def _describe_command(self, command: commands.Command) -> dict:
+        # enough for the stubs to show up in help like the real thing
+        return {
+            "name": command.name,
+            "aliases": list(command.aliases),
+            "help": command.help,
+            "brief": command.brief,
+            "usage": command.usage if command.usage is not None else command.signature,
+            "hidden": command.hidden,
+            "children": [
+                self._describe_command(child)
+                for child in sorted(getattr(command, "commands", ()), key=lambda child: child.name)
+            ],
+        }
+
+    def describe(self, name: str) -> dict:
+        cogs = self._cogs(name)
+        return {
+            "commands": [self._describe_command(command) for cog in cogs for command in cog.get_commands()],
+            "listeners": sorted({event for cog in cogs for event, _ in cog.get_listeners()}),
+        }
+
+    def record(self, name: str) -> None:
+        self.manifest[name] = self.describe(name)
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=4)
+
+    def defer(self, name: str) -> bool:
+        """Registers stubs for an extension, returns False if it has to be loaded now."""
+        entry = self.manifest.get(name)
+        if entry is None:
+            return False
+
+        for data in entry["commands"]:
+            self.bot.add_command(self._command_stub(name, data))
+
+        self._listeners[name] = []
+        for event in entry["listeners"]:
+            stub = self._listener_stub(name, event)
+            self.bot.add_listener(stub, event)
+            self._listeners[name].append((stub, event))
+
+        self.pending[name] = entry
+        return True
+
+    def load(self, name: str) -> None:
+        entry = self.pending.pop(name, None)
+        if entry is None:
+            return
+
+        for data in entry["commands"]:
+            self.bot.remove_command(data["name"])
+        for stub, event in self._listeners.pop(name, ()):
+            self.bot.remove_listener(stub, event)
+
+        self.bot.load_extension(name)
+        self.record(name)
+        self.save()
+
+    def load_all(self) -> None:
+        for name in tuple(self.pending):
+            self.load(name)
+
+    def _command_stub(self, extension: str, data: dict) -> commands.Command:
+        async def stub(ctx, *, _: str = None):
+            if extension not in self.pending:
+                return
+            self.load(extension)
+            new = await ctx.bot.get_context(ctx.message)
+            await ctx.bot.invoke(new)
+
+        # manifests written before the help fields were recorded only have the names
+        kwargs = {
+            "name": data["name"],
+            "aliases": data["aliases"],
+            "help": data.get("help"),
+            "brief": data.get("brief"),
+            "usage": data.get("usage"),
+            "hidden": data.get("hidden", "help" not in data),
+        }
+        if not data.get("children"):
+            return commands.Command(stub, **kwargs)
+
+        # the stub takes the whole input either way, the children are only there for help
+        group = commands.Group(stub, invoke_without_command=True, **kwargs)
+        for child in data["children"]:
+            group.add_command(self._command_stub(extension, child))
+        return group
+
+    def _listener_stub(self, extension: str, event: str):
+        async def stub(*args, **kwargs):
+            if extension not in self.pending:
+                return
+            names = [name for name, entry in self.pending.items() if event in entry["listeners"]]
+            for name in names:
+                self.load(name)
+            # only the cogs just loaded missed this one, and awaiting them lets callers see their errors
+            listeners = [
+                listener
+                for name in names
+                for cog in self._cogs(name)
+                for listener_event, listener in cog.get_listeners()
+                if listener_event == event
+            ]
+            results = await asyncio.gather(
+                *(listener(*args, **kwargs) for listener in listeners), return_exceptions=True
+            )
+            errors = [result for result in results if isinstance(result, Exception)]
+            if errors:
+                raise errors[0]
+
+        return stub
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+from typing import Dict
+
+import discord
+
+__all__ = ("MemberCache",)
+
+log = logging.getLogger(__name__)
+
+
+class MemberCache:
+    """Decides which members stay in the cache.
+
+    ``all`` keeps the discord.py behaviour of chunking every guild at startup.
+    ``recent`` skips that, and only keeps members seen in the last ``minutes`` minutes. A guild
+    gets chunked the first time something needs its full member list, see :meth:`chunk`.
+    """
+
+    def __init__(self, bot, *, policy: str = "all", minutes: int = 30) -> None:
+        if policy not in ("all", "recent"):
+            raise ValueError(f"Unknown member cache policy {policy!r}")
+
+        self.bot = bot
+        self.policy = policy
+        self.ttl = minutes * 60
+
+        self._seen: Dict[int, Dict[int, float]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+        if self.policy == "recent":
+            self.bot.add_listener(self.on_message)
+            self.bot.add_listener(self.on_member_join)
+            self.bot.add_listener(self.on_member_update)
+            self.bot.add_listener(self.on_member_remove)
+            self.bot.add_listener(self.on_guild_remove)
+            self.bot.supervisor.register("member_sweep", self.run, interval=60, ready=True)
+
+    @property
+    def complete(self) -> bool:
+        """Whether every member of every guild is cached."""
+        return self.policy == "all"
+
+    def touch(self, member: discord.Member) -> None:
+        self._seen.setdefault(member.guild.id, {})[member.id] = time.monotonic()
+
+    async def on_message(self, message: discord.Message):
+        if isinstance(message.author, discord.Member):
+            self.touch(message.author)
+
+    async def on_member_join(self, member: discord.Member):
+        self.touch(member)
+
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        self.touch(after)
+
+    async def on_member_remove(self, member: discord.Member):
+        if (seen := self._seen.get(member.guild.id)) is not None:
+            seen.pop(member.id, None)
+
+    async def on_guild_remove(self, guild: discord.Guild):
+        self._seen.pop(guild.id, None)
+        self._locks.pop(guild.id, None)
+
+    async def chunk(self, guild: discord.Guild) -> None:
+        """Makes sure every member of the guild is cached, for at least ``minutes`` minutes."""
+        if guild.chunked:
+            return
+
+        lock = self._locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            if guild.chunked:
+                return
+            start = time.perf_counter()
+            members = await guild.chunk()
+            for member in members:
+                self.touch(member)
+            log.info(f"Chunked {len(members):,} members of {guild.id} in {time.perf_counter() - start:.2f}s.")
+
+    def sweep(self) -> int:
+        cutoff = time.monotonic() - self.ttl
+        me = self.bot.user.id if self.bot.user else None
+        evicted = 0
+        for guild in self.bot.guilds:
+            seen = self._seen.get(guild.id, {})
+            for member in list(guild.members):
+                if member.id == me or seen.get(member.id, 0) > cutoff:
+                    continue
+                guild._remove_member(member)
+                seen.pop(member.id, None)
+                evicted += 1
+            # members that left without an event reaching us
+            for member_id in [member_id for member_id, at in seen.items() if at <= cutoff]:
+                del seen[member_id]
+        for guild_id in self._seen.keys() - {guild.id for guild in self.bot.guilds}:
+            self._seen.pop(guild_id)
+            self._locks.pop(guild_id, None)
+        return evicted
+
+    async def run(self) -> None:
+        if evicted := self.sweep():
+            log.debug(f"Evicted {evicted:,} members from the cache.")
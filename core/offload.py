@@ -0,0 +1,94 @@
+import asyncio
+import functools
+import logging
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from statistics import mean
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+__all__ = ("Offloader",)
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _timed(func: Callable[..., T], args: tuple, kwargs: dict) -> Tuple[float, T]:
+    # module level so it pickles for the process pool, monotonic is the same clock in every process
+    return time.monotonic(), func(*args, **kwargs)
+
+
+class Offloader:
+    """Runs blocking functions in a thread pool, or a process pool for CPU heavy ones.
+
+    ``processes=0`` disables the process pool, ``process=True`` calls then go to the threads.
+    """
+
+    def __init__(self, *, threads: int = 4, processes: int = 0) -> None:
+        self.threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="offload")
+        self.processes: Optional[ProcessPoolExecutor] = None
+        self._max_processes = processes
+
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.waits: Deque[float] = deque(maxlen=500)
+        self.runs: Deque[float] = deque(maxlen=500)
+
+    def _executor(self, process: bool) -> Executor:
+        if not process or not self._max_processes:
+            return self.threads
+        if self.processes is None:
+            # started on first use, most runs never need it
+            self.processes = ProcessPoolExecutor(max_workers=self._max_processes)
+        return self.processes
+
+    async def __call__(
+        self, func: Callable[..., T], *args: Any, deadline: Optional[float] = None, process: bool = False, **kwargs: Any
+    ) -> T:
+        """Runs ``func(*args, **kwargs)`` off the event loop.
+
+        Raises :exc:`asyncio.TimeoutError` if it didn't finish within ``deadline`` seconds, a call
+        still waiting for a worker is then dropped, one already running can't be stopped.
+        """
+        loop = asyncio.get_running_loop()
+        queued_at = time.monotonic()
+        future = loop.run_in_executor(self._executor(process), functools.partial(_timed, func, args, kwargs))
+
+        self.queued += 1
+        try:
+            started, result = await asyncio.wait_for(asyncio.shield(future), timeout=deadline)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            future.cancel()
+            log.warning(f"Offloaded {getattr(func, '__qualname__', func)} missed its {deadline}s deadline.")
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.queued -= 1
+
+        self.completed += 1
+        self.waits.append(started - queued_at)
+        self.runs.append(time.monotonic() - started)
+        return result
+
+    def shutdown(self) -> None:
+        self.threads.shutdown(wait=False)
+        if self.processes is not None:
+            self.processes.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.queued,
+            "backlog": self.threads._work_queue.qsize(),
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "average_wait": round(1000 * mean(self.waits), 2) if self.waits else 0.0,
+            "average_run": round(1000 * mean(self.runs), 2) if self.runs else 0.0,
+            "max_run": round(1000 * max(self.runs), 2) if self.runs else 0.0,
+        }
@@ -0,0 +1,172 @@
+import asyncio
+import enum
+import itertools
+import logging
+import time
+from collections import deque
+from statistics import mean
+from typing import Any, Deque, Dict, Optional
+
+import discord
+
+__all__ = ("Priority", "Outbox")
+
+log = logging.getLogger(__name__)
+
+
+class Priority(enum.IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "send", "kwargs", "mergeable", "futures", "queued_at")
+
+    def __init__(self, priority: Priority, seq: int, send, kwargs: Dict[str, Any], mergeable: bool) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.send = send
+        self.kwargs = kwargs
+        self.mergeable = mergeable
+        self.futures = [asyncio.get_running_loop().create_future()]
+        self.queued_at = time.perf_counter()
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _Bucket:
+    def __init__(self, rate: int) -> None:
+        self.queue: "asyncio.PriorityQueue[_Job]" = asyncio.PriorityQueue()
+        self.sent: Deque[float] = deque(maxlen=rate)
+        self.task: Optional[asyncio.Task] = None
+
+
+class Outbox:
+    """Sends and edits messages through one queue per channel.
+
+    Each channel sends at most ``rate`` messages every ``per`` seconds, which is Discord's own
+    limit, so a burst waits in the queue instead of running into 429s. Interactive replies go
+    ahead of background notifications, and queued background messages that only have content
+    can be merged into one message.
+    """
+
+    def __init__(self, *, rate: int = 5, per: float = 5.0, merge_limit: int = 2000) -> None:
+        self.rate = rate
+        self.per = per
+        self.merge_limit = merge_limit
+
+        self._buckets: Dict[int, _Bucket] = {}
+        self._seq = itertools.count()
+        self.waits: Deque[float] = deque(maxlen=500)
+        self.sent = 0
+        self.merged = 0
+
+    async def send(
+        self,
+        destination: discord.abc.Messageable,
+        content: Optional[str] = None,
+        *,
+        priority: Priority = Priority.BACKGROUND,
+        merge: bool = False,
+        **kwargs,
+    ) -> discord.Message:
+        """Queues :meth:`discord.abc.Messageable.send`.
+
+        ``merge`` lets the message be joined with other queued mergeable messages of the channel,
+        it is ignored unless the message only has content.
+        """
+        if content is not None:
+            kwargs["content"] = str(content)
+
+        async def send(**kw):
+            # not destination.send, Context.send itself goes through here
+            return await discord.abc.Messageable.send(destination, **kw)
+
+        channel = getattr(destination, "channel", destination)
+        mergeable = merge and kwargs.keys() == {"content"}
+        return await self._enqueue(channel.id, priority, send, kwargs, mergeable)
+
+    async def edit(
+        self, message: discord.Message, *, priority: Priority = Priority.BACKGROUND, **kwargs
+    ) -> Optional[discord.Message]:
+        return await self._enqueue(message.channel.id, priority, message.edit, kwargs, False)
+
+    def _enqueue(self, channel_id: int, priority: Priority, send, kwargs: dict, mergeable: bool) -> asyncio.Future:
+        job = _Job(priority, next(self._seq), send, kwargs, mergeable)
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            bucket = self._buckets[channel_id] = _Bucket(self.rate)
+            bucket.task = asyncio.create_task(self._worker(channel_id, bucket))
+        bucket.queue.put_nowait(job)
+        return job.futures[0]
+
+    def _merge(self, job: _Job, queue: "asyncio.PriorityQueue[_Job]") -> None:
+        while not queue.empty():
+            other = queue.get_nowait()
+            queue.task_done()
+            content = job.kwargs["content"] + "\n\n" + other.kwargs.get("content", "")
+            if not other.mergeable or other.priority != job.priority or len(content) > self.merge_limit:
+                # it keeps its place, the queue is ordered by priority and sequence
+                queue.put_nowait(other)
+                return
+            job.kwargs["content"] = content
+            job.futures.extend(other.futures)
+            self.merged += 1
+
+    async def _worker(self, channel_id: int, bucket: _Bucket) -> None:
+        while True:
+            # throttle before taking a job, so anything more urgent queued meanwhile still goes first
+            if len(bucket.sent) == self.rate and (delay := bucket.sent[0] + self.per - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                # waiting for `per` seconds keeps the rate limit around for the next burst
+                job = await asyncio.wait_for(bucket.queue.get(), timeout=self.per)
+            except asyncio.TimeoutError:
+                if bucket.queue.empty():
+                    del self._buckets[channel_id]
+                    return
+                continue
+
+            if job.mergeable:
+                self._merge(job, bucket.queue)
+
+            self.waits.append(time.perf_counter() - job.queued_at)
+            bucket.sent.append(time.monotonic())
+            try:
+                result = await job.send(**job.kwargs)
+            except Exception as err:
+                for future in job.futures:
+                    if not future.done():
+                        future.set_exception(err)
+            else:
+                self.sent += 1
+                for future in job.futures:
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                bucket.queue.task_done()
+
+    async def drain(self, timeout: float) -> bool:
+        """Waits for every queued message to be sent, returns False if that took longer than ``timeout``."""
+        queues = [bucket.queue.join() for bucket in self._buckets.values()]
+        try:
+            await asyncio.wait_for(asyncio.gather(*queues), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        depth = {priority.name.lower(): 0 for priority in Priority}
+        for bucket in self._buckets.values():
+            for job in bucket.queue._queue:
+                depth[job.priority.name.lower()] += 1
+        return {
+            "channels": len(self._buckets),
+            "depth": depth,
+            "sent": self.sent,
+            "merged": self.merged,
+            "average_wait": round(1000 * mean(self.waits), 2) if self.waits else 0.0,
+            "max_wait": round(1000 * max(self.waits), 2) if self.waits else 0.0,
+        }
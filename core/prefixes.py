@@ -0,0 +1,109 @@
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from discord.ext import commands
+
+import config
+
+__all__ = ("PrefixMatcher", "PrefixManager")
+
+log = logging.getLogger(__name__)
+
+
+class PrefixMatcher:
+    """A set of prefixes compiled into a single anchored regex.
+
+    Longer prefixes are tried first so ``$$`` wins over ``$``.
+    """
+
+    __slots__ = ("prefixes", "_pattern")
+
+    def __init__(self, prefixes: Iterable[str]):
+        self.prefixes: Tuple[str, ...] = tuple(sorted(set(prefixes), key=len, reverse=True))
+        self._pattern = re.compile("|".join(re.escape(p) for p in self.prefixes))
+
+    def match(self, content: str) -> Optional[str]:
+        match = self._pattern.match(content)
+        return match.group(0) if match is not None else None
+
+
+class PrefixManager:
+    """In-memory cache of per-guild prefixes, backed by ``public.prefixes``.
+
+    Every read is served from memory, writes go to the database first and then update the cache.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.default: Tuple[str, ...] = tuple(config.prefix)
+
+        self._prefixes: Dict[int, Tuple[str, ...]] = {}
+        self._matchers: Dict[Optional[int], PrefixMatcher] = {}
+
+    def _mentions(self) -> List[str]:
+        user = self.bot.user
+        if user is None:
+            return []
+        return [f"<@{user.id}> ", f"<@!{user.id}> "]
+
+    def get(self, guild_id: Optional[int]) -> Tuple[str, ...]:
+        return self._prefixes.get(guild_id, self.default)
+
+    def custom(self, guild_id: Optional[int]) -> Tuple[str, ...]:
+        return self._prefixes.get(guild_id, ())
+
+    def matcher(self, guild_id: Optional[int]) -> PrefixMatcher:
+        key = guild_id if guild_id in self._prefixes else None
+        try:
+            return self._matchers[key]
+        except KeyError:
+            matcher = self._matchers[key] = PrefixMatcher(self._mentions() + list(self.get(guild_id)))
+            return matcher
+
+    def resolve(self, guild_id: Optional[int], content: str) -> Union[str, Tuple[str, ...]]:
+        matcher = self.matcher(guild_id)
+        return matcher.match(content) or matcher.prefixes
+
+    def _set(self, guild_id: int, prefixes: Iterable[str]) -> None:
+        prefixes = tuple(prefixes)
+        if prefixes:
+            self._prefixes[guild_id] = prefixes
+        else:
+            self._prefixes.pop(guild_id, None)
+        self._matchers.pop(guild_id, None)
+
+    def invalidate(self) -> None:
+        """Drops every compiled matcher, e.g. once the bot user is known."""
+        self._matchers.clear()
+
+    async def load(self) -> None:
+        rows = await self.bot.pool.fetch(
+            "SELECT id, ARRAY_AGG(prefix) AS prefixes FROM public.prefixes GROUP BY id", primary=True
+        )
+        self._prefixes = {row["id"]: tuple(row["prefixes"]) for row in rows}
+        self.invalidate()
+        log.info(f"Loaded prefixes for {len(self._prefixes)} guilds.")
+
+    async def add(self, guild_id: int, prefix: str) -> None:
+        """Raises :exc:`commands.BadArgument` if the prefix wasn't stored, the cache is left alone then."""
+        async with self.bot.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("INSERT INTO public.guilds (id) VALUES ($1) ON CONFLICT DO NOTHING", guild_id)
+                status = await conn.execute(
+                    "INSERT INTO public.prefixes (id, prefix) VALUES ($1, $2) ON CONFLICT DO NOTHING", guild_id, prefix
+                )
+        if status == "INSERT 0 0":
+            # the cache only changes with the database
+            raise commands.BadArgument(f"`{prefix}` is already a prefix here.")
+        current = self._prefixes.get(guild_id, ())
+        if prefix not in current:
+            self._set(guild_id, current + (prefix,))
+
+    async def remove(self, guild_id: int, prefix: str) -> None:
+        await self.bot.pool.execute("DELETE FROM public.prefixes WHERE id = $1 AND prefix = $2", guild_id, prefix)
+        self._set(guild_id, (p for p in self._prefixes.get(guild_id, ()) if p != prefix))
+
+    async def reset(self, guild_id: int) -> None:
+        await self.bot.pool.execute("DELETE FROM public.prefixes WHERE id = $1", guild_id)
+        self._set(guild_id, ())
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import discord
+
+__all__ = ("Resolver",)
+
+log = logging.getLogger(__name__)
+
+Key = Tuple[str, int]
+
+
+class Resolver:
+    """Gets users, channels and messages from the cache, or fetches them.
+
+    Concurrent fetches of the same id share one request, and ids that came back as NotFound or
+    Forbidden are remembered for ``negative_ttl`` seconds, raising the same error again without
+    a request. At most ``concurrency`` requests are in flight at once.
+    """
+
+    def __init__(self, bot, *, negative_ttl: float = 60.0, concurrency: int = 5) -> None:
+        self.bot = bot
+        self.negative_ttl = negative_ttl
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+        self._inflight: Dict[Key, asyncio.Task] = {}
+        self._misses: Dict[Key, Tuple[float, discord.HTTPException]] = {}
+
+        self.fetches = 0
+        self.coalesced = 0
+
+    async def user(self, user_id: int) -> discord.User:
+        return await self._resolve(("user", user_id), self.bot.get_user, lambda: self.bot.fetch_user(user_id))
+
+    async def channel(self, channel_id: int) -> discord.abc.GuildChannel:
+        return await self._resolve(
+            ("channel", channel_id), self.bot.get_channel, lambda: self.bot.fetch_channel(channel_id)
+        )
+
+    async def message(self, channel: discord.abc.Messageable, message_id: int) -> discord.Message:
+        return await self._resolve(
+            ("message", message_id), self.bot.messages.get, lambda: channel.fetch_message(message_id)
+        )
+
+    async def users(self, user_ids: Iterable[int]) -> Dict[int, discord.User]:
+        """Resolves every id it can, ids that can't be fetched are left out."""
+
+        async def resolve(user_id: int) -> Optional[discord.User]:
+            try:
+                return await self.user(user_id)
+            except discord.HTTPException:
+                return None
+
+        user_ids = tuple(dict.fromkeys(user_ids))
+        users = await asyncio.gather(*(resolve(user_id) for user_id in user_ids))
+        return {user_id: user for user_id, user in zip(user_ids, users) if user is not None}
+
+    def forget(self, kind: str, snowflake: int) -> None:
+        """Drops a cached miss, for when the id is known to exist now."""
+        self._misses.pop((kind, snowflake), None)
+
+    async def _resolve(self, key: Key, get: Callable[[int], Any], fetch: Callable[[], Awaitable[Any]]) -> Any:
+        if (obj := get(key[1])) is not None:
+            return obj
+
+        if (miss := self._misses.get(key)) is not None:
+            expires, error = miss
+            if expires > time.monotonic():
+                raise error
+            del self._misses[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._fetch(key, fetch))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # one caller getting cancelled shouldn't cancel the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: Key, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        async with self.semaphore:
+            self.fetches += 1
+            try:
+                return await fetch()
+            except (discord.NotFound, discord.Forbidden) as error:
+                self._remember(key, error)
+                raise
+
+    def _remember(self, key: Key, error: discord.HTTPException) -> None:
+        now = time.monotonic()
+        if len(self._misses) > 10_000:
+            self._misses = {k: v for k, v in self._misses.items() if v[0] > now}
+        self._misses[key] = (now + self.negative_ttl, error)
+        log.debug(f"Caching {type(error).__name__} for {key[0]} {key[1]}.")
@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+import discord
+
+__all__ = ("SessionStore", "dump_guild", "dump_user", "restore_guilds")
+
+log = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """Keeps the gateway session of every shard on disk between restarts.
+
+    Sessions older than ``max_age`` seconds are thrown away, Discord would only answer them with
+    INVALID_SESSION anyways. The guilds of each shard are kept along with it, the gateway won't send
+    them again on RESUME. A session stored without them is not resumed.
+    """
+
+    def __init__(self, path: str = "data/sessions.json", *, max_age: float = 120.0) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.sessions: Dict[int, dict] = {}
+        self.user: Optional[dict] = None
+        self.loaded = False
+
+    def load(self, shard_count: int) -> None:
+        self.loaded = True
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        finally:
+            # a session can only be resumed once
+            self.discard()
+
+        age = time.time() - data.get("saved_at", 0)
+        if age > self.max_age or data.get("shard_count") != shard_count:
+            log.info(f"Ignoring stored gateway sessions ({age:.0f}s old).")
+            return
+
+        self.user = data.get("user")
+        # an older file without the guilds can't be resumed into a cold cache
+        self.sessions = {
+            int(shard_id): session
+            for shard_id, session in data["shards"].items()
+            if self.user is not None and "guilds" in session
+        }
+        log.info(f"Loaded gateway sessions for {len(self.sessions)} shards ({age:.0f}s old).")
+
+    def pop(self, shard_id: int, shard_count: int) -> Optional[dict]:
+        if not self.loaded:
+            self.load(shard_count)
+        return self.sessions.pop(shard_id, None)
+
+    def save(self, shard_count: int, websockets: Iterable, *, user: dict, guilds: Dict[int, List[dict]]) -> None:
+        shards = {
+            ws.shard_id: {
+                "session_id": ws.session_id,
+                "sequence": ws.sequence,
+                "gateway": ws.gateway,
+                "guilds": guilds.get(ws.shard_id, []),
+            }
+            for ws in websockets
+            if ws is not None and ws.session_id is not None
+        }
+        if not shards:
+            return
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"saved_at": time.time(), "shard_count": shard_count, "user": user, "shards": shards}, f)
+        log.info(f"Saved gateway sessions for {len(shards)} shards.")
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def dump_user(user: discord.abc.User) -> dict:
+    return {
+        "id": user.id,
+        "username": user.name,
+        "discriminator": user.discriminator,
+        "avatar": user.avatar.key if user.avatar else None,
+        "bot": user.bot,
+    }
+
+
+def dump_guild(guild: discord.Guild) -> dict:
+    """The guild as a GUILD_CREATE payload, with just its roles, channels, emojis and our own member.
+
+    Voice states, threads and the other members are left out, members get chunked on demand.
+    """
+    me = guild.me
+    return {
+        "id": guild.id,
+        "name": guild.name,
+        "icon": guild.icon.key if guild.icon else None,
+        "owner_id": guild.owner_id,
+        "member_count": guild.member_count,
+        "features": list(guild.features),
+        "premium_tier": guild.premium_tier,
+        "verification_level": guild.verification_level.value,
+        "system_channel_id": guild.system_channel.id if guild.system_channel else None,
+        "roles": [
+            {
+                "id": role.id,
+                "name": role.name,
+                "permissions": str(role.permissions.value),
+                "position": role.position,
+                "color": role.colour.value,
+                "hoist": role.hoist,
+                "managed": role.managed,
+                "mentionable": role.mentionable,
+            }
+            for role in guild.roles
+        ],
+        "channels": [
+            {
+                "id": channel.id,
+                "type": channel.type.value,
+                "name": channel.name,
+                "position": channel.position,
+                "parent_id": channel.category_id,
+                "permission_overwrites": [overwrite._asdict() for overwrite in channel._overwrites],
+                "topic": getattr(channel, "topic", None),
+                "nsfw": getattr(channel, "nsfw", False),
+                "rate_limit_per_user": getattr(channel, "slowmode_delay", 0),
+                "bitrate": getattr(channel, "bitrate", None),
+                "user_limit": getattr(channel, "user_limit", None),
+            }
+            for channel in guild.channels
+        ],
+        "emojis": [
+            {
+                "id": emoji.id,
+                "name": emoji.name,
+                "animated": emoji.animated,
+                "roles": [role.id for role in emoji.roles],
+                "require_colons": emoji.require_colons,
+                "managed": emoji.managed,
+                "available": emoji.available,
+            }
+            for emoji in guild.emojis
+        ],
+        "members": (
+            [
+                {
+                    "user": dump_user(me),
+                    "roles": [role.id for role in me.roles[1:]],
+                    "nick": me.nick,
+                    "joined_at": me.joined_at.isoformat() if me.joined_at else None,
+                    "flags": 0,
+                }
+            ]
+            if me is not None
+            else []
+        ),
+    }
+
+
+def restore_guilds(state, user: dict, guilds: Iterable[dict]) -> int:
+    """Fills the guild cache from :func:`dump_guild` payloads, before the shard resumes and replays its events."""
+    if state.user is None:
+        state.user = discord.ClientUser(state=state, data=user)
+    count = 0
+    for data in guilds:
+        if state._get_guild(int(data["id"])) is None:
+            state._add_guild_from_data(data)
+            count += 1
+    return count
@@ -0,0 +1,76 @@
+import logging
+import os
+import pickle
+import time
+import zlib
+from collections import Counter
+
+__all__ = ("save_snapshot", "load_snapshot")
+
+log = logging.getLogger(__name__)
+
+VERSION = 2
+
+
+def save_snapshot(bot, path: str) -> None:
+    """Writes the derived state of the bot to disk, only meant to be called on a clean shutdown."""
+    extra = bot.extra
+    data = {
+        "version": VERSION,
+        "saved_at": time.time(),
+        "guilds": sorted(extra.known_guilds),
+        "since": extra.since,
+        "socket_stats": dict(extra.socket_stats),
+        "command_stats": dict(extra.command_stats),
+        "socket_baseline": dict(extra.socket_baseline),
+        "commands_baseline": extra.commands_baseline,
+        "socket_totals": dict(extra.socket_totals),
+        "commands_total": extra.commands_total,
+        "socket_pending": dict(extra.socket_pending),
+        "socket_flushed": dict(extra.socket_flushed),
+        "commands_flushed": extra.commands_flushed,
+        "cog_metadata": extra.cog_metadata,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(zlib.compress(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)))
+    log.info(f"Saved snapshot to {path} ({os.path.getsize(path):,} bytes).")
+
+
+def load_snapshot(bot, path: str) -> bool:
+    """Restores the state saved by :func:`save_snapshot`.
+
+    The file is removed afterwards, so a crash can never bring back old counters.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = pickle.loads(zlib.decompress(f.read()))
+    except (OSError, zlib.error, pickle.UnpicklingError, EOFError):
+        return False
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    if data.get("version") != VERSION:
+        log.info("Ignoring snapshot from an older version.")
+        return False
+
+    extra = bot.extra
+    extra.known_guilds = set(data["guilds"])
+    extra.since = data["since"]
+    extra.socket_stats = Counter(data["socket_stats"])
+    extra.command_stats = Counter(data["command_stats"])
+    extra.socket_baseline = Counter(data["socket_baseline"])
+    extra.commands_baseline = data["commands_baseline"]
+    extra.socket_totals = Counter(data["socket_totals"])
+    extra.commands_total = data["commands_total"]
+    extra.socket_pending = Counter(data["socket_pending"])
+    extra.socket_flushed = Counter(data["socket_flushed"])
+    extra.commands_flushed = data["commands_flushed"]
+    extra.cog_metadata = data["cog_metadata"]
+    extra.warm = True
+
+    log.info(f"Loaded snapshot from {time.time() - data['saved_at']:.0f}s ago.")
+    return True
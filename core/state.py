@@ -0,0 +1,262 @@
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set
+
+import discord
+from discord.shard import AutoShardedConnectionState
+
+__all__ = ("MessageCache", "ParserTable", "CachedConnectionState", "cache_events", "gateway_events")
+
+log = logging.getLogger(__name__)
+
+# always parsed, the connection, the guild cache, member counts and commands depend on them
+ESSENTIAL_EVENTS = frozenset(
+    {
+        "READY",
+        "RESUMED",
+        "GUILD_CREATE",
+        "GUILD_UPDATE",
+        "GUILD_DELETE",
+        "GUILD_MEMBERS_CHUNK",
+        "GUILD_MEMBER_ADD",
+        "GUILD_MEMBER_REMOVE",
+        "GUILD_ROLE_CREATE",
+        "GUILD_ROLE_UPDATE",
+        "GUILD_ROLE_DELETE",
+        "CHANNEL_CREATE",
+        "CHANNEL_UPDATE",
+        "CHANNEL_DELETE",
+        "MESSAGE_CREATE",
+        "INTERACTION_CREATE",
+    }
+)
+
+# parsed as well while the matching cache is populated, or what it holds would go stale or never leave it
+MESSAGE_CACHE_EVENTS = frozenset(
+    {
+        "MESSAGE_UPDATE",
+        "MESSAGE_DELETE",
+        "MESSAGE_DELETE_BULK",
+        "MESSAGE_REACTION_ADD",
+        "MESSAGE_REACTION_REMOVE",
+        "MESSAGE_REACTION_REMOVE_ALL",
+        "MESSAGE_REACTION_REMOVE_EMOJI",
+    }
+)
+MEMBER_CACHE_EVENTS = frozenset({"GUILD_MEMBER_UPDATE"})
+
+# the gateway events behind a dispatched event, for the ones not just named after it
+DISPATCHED_BY = {
+    "message": ("MESSAGE_CREATE",),
+    "message_edit": ("MESSAGE_UPDATE",),
+    "message_delete": ("MESSAGE_DELETE",),
+    "bulk_message_delete": ("MESSAGE_DELETE_BULK",),
+    "reaction_add": ("MESSAGE_REACTION_ADD",),
+    "reaction_remove": ("MESSAGE_REACTION_REMOVE",),
+    "reaction_clear": ("MESSAGE_REACTION_REMOVE_ALL",),
+    "reaction_clear_emoji": ("MESSAGE_REACTION_REMOVE_EMOJI",),
+    "member_join": ("GUILD_MEMBER_ADD",),
+    "member_remove": ("GUILD_MEMBER_REMOVE",),
+    "member_update": ("GUILD_MEMBER_UPDATE", "PRESENCE_UPDATE"),
+    "user_update": ("GUILD_MEMBER_UPDATE", "PRESENCE_UPDATE", "USER_UPDATE"),
+    "member_ban": ("GUILD_BAN_ADD",),
+    "member_unban": ("GUILD_BAN_REMOVE",),
+    "guild_emojis_update": ("GUILD_EMOJIS_UPDATE",),
+    "guild_channel_pins_update": ("CHANNEL_PINS_UPDATE",),
+    "private_channel_pins_update": ("CHANNEL_PINS_UPDATE",),
+    "typing": ("TYPING_START",),
+}
+
+
+def gateway_events(event: str) -> Iterable[str]:
+    """The gateway events that have to be parsed for ``event`` (without ``on_``) to be dispatched."""
+    if event.startswith("raw_"):
+        event = event[4:]
+    # anything else is either named after its gateway event, or the bot's own like command_completion
+    return DISPATCHED_BY.get(event, (event.upper(),))
+
+
+def cache_events(*, messages: bool, members: bool) -> frozenset:
+    """The events the enabled caches need on top of :data:`ESSENTIAL_EVENTS`."""
+    events = frozenset()
+    if messages:
+        events |= MESSAGE_CACHE_EVENTS
+    if members:
+        events |= MEMBER_CACHE_EVENTS
+    return events
+
+
+def estimate_size(message: discord.Message) -> int:
+    """A rough guess of how much memory a cached message takes up, walking the object graph is too slow."""
+    size = 1024 + len(message.content or "")
+    size += 2048 * len(message.embeds)
+    size += 512 * len(message.attachments)
+    size += 128 * (len(message.reactions) + len(message.mentions) + len(message.raw_role_mentions))
+    return size
+
+
+class MessageCache:
+    """Replaces the message deque of the connection state.
+
+    Messages are indexed by id, each channel keeps at most ``per_channel`` of them and the whole
+    cache stays under ``max_bytes``, evicting the least recently used message first. Pinned
+    messages are never evicted.
+
+    It mimics the bits of :class:`collections.deque` discord.py uses, so the state doesn't notice.
+    """
+
+    def __init__(self, *, max_bytes: int, per_channel: int) -> None:
+        self.max_bytes = max_bytes
+        self.per_channel = per_channel
+        self.size = 0
+        self.evicted = 0
+
+        self._messages: "OrderedDict[int, discord.Message]" = OrderedDict()
+        self._sizes: Dict[int, int] = {}
+        self._channels: Dict[int, "OrderedDict[int, None]"] = {}
+        self._pinned: Set[int] = set()
+
+    def get(self, message_id: int) -> Optional[discord.Message]:
+        message = self._messages.get(message_id)
+        if message is not None:
+            self._messages.move_to_end(message_id)
+            self._channels[message.channel.id].move_to_end(message_id)
+        return message
+
+    def pin(self, message_id: int) -> None:
+        """Keeps the message in the cache until it gets unpinned or deleted, it doesn't have to be cached yet."""
+        self._pinned.add(message_id)
+
+    def unpin(self, message_id: int) -> None:
+        self._pinned.discard(message_id)
+
+    def append(self, message: discord.Message) -> None:
+        if message.id in self._messages:
+            self._pop(message.id)
+
+        size = estimate_size(message)
+        self._messages[message.id] = message
+        self._sizes[message.id] = size
+        self.size += size
+
+        channel = self._channels.setdefault(message.channel.id, OrderedDict())
+        channel[message.id] = None
+
+        while len(channel) > self.per_channel and self._evict(channel):
+            pass
+        while self.size > self.max_bytes and self._evict(self._messages):
+            pass
+
+    def remove(self, message: discord.Message) -> None:
+        self._pop(message.id)
+        self._pinned.discard(message.id)
+
+    def clear(self) -> None:
+        self._messages.clear()
+        self._sizes.clear()
+        self._channels.clear()
+        self.size = 0
+
+    def _pop(self, message_id: int) -> Optional[discord.Message]:
+        message = self._messages.pop(message_id, None)
+        if message is None:
+            return None
+
+        self.size -= self._sizes.pop(message_id)
+        channel = self._channels[message.channel.id]
+        del channel[message_id]
+        if not channel:
+            del self._channels[message.channel.id]
+        return message
+
+    def _evict(self, order: Iterable[int]) -> bool:
+        """Evicts the least recently used message that isn't pinned, returns False if there is none."""
+        message_id = next((m for m in order if m not in self._pinned), None)
+        if message_id is None:
+            return False
+        self._pop(message_id)
+        self.evicted += 1
+        return True
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[discord.Message]:
+        return iter(self._messages.values())
+
+    def __reversed__(self) -> Iterator[discord.Message]:
+        return reversed(self._messages.values())
+
+    def __getitem__(self, index):
+        return list(self._messages.values())[index]
+
+    def __contains__(self, message) -> bool:
+        return getattr(message, "id", None) in self._messages
+
+
+def _skip(data: dict) -> None:
+    pass
+
+
+class ParserTable(dict):
+    """The parsers of the connection state, the gateway looks every dispatched event up in here.
+
+    That lookup is where events get counted, which is a lot cheaper than dispatching
+    ``socket_response`` for every payload. Once :meth:`listen` was called, events nothing listens
+    to (except the essential ones and the ``always`` ones, see :func:`cache_events`) are only
+    counted, and never turned into models or dispatched.
+    """
+
+    def __init__(self, parsers: Dict[str, Callable], count: Callable[[str], None], always: Iterable[str] = ()):
+        super().__init__(parsers)
+        self.count = count
+        self.always = ESSENTIAL_EVENTS | set(always)
+        self.allowed: Optional[Set[str]] = None
+
+    def listen(self, events: Iterable[str]) -> None:
+        """Only parses what the listeners of these dispatched events need from now on."""
+        allowed = set(self.always)
+        for event in events:
+            allowed.update(gateway_events(event))
+        if allowed != self.allowed:
+            log.debug(f"Parsing {len(allowed)} gateway events.")
+        self.allowed = allowed
+
+    def __getitem__(self, event: str) -> Callable[[dict], None]:
+        self.count(event)
+        if self.allowed is not None and event not in self.allowed:
+            return _skip
+        return super().__getitem__(event)
+
+
+class CachedConnectionState(AutoShardedConnectionState):
+    """Connection state that keeps its messages in a :class:`MessageCache`."""
+
+    message_cache: MessageCache
+
+    @classmethod
+    def adopt(cls, state: AutoShardedConnectionState, cache: MessageCache) -> "CachedConnectionState":
+        # the state is built by discord.py, so its arguments don't have to be kept in sync here
+        state.__dict__.pop("_messages", None)
+        state.__class__ = cls
+        state.message_cache = cache
+        return state
+
+    @property
+    def _messages(self) -> MessageCache:
+        return self.message_cache
+
+    @_messages.setter
+    def _messages(self, value) -> None:
+        # discord.py assigns a new deque on READY, and one without the guild's messages on GUILD_DELETE
+        if value is self.message_cache:
+            return
+        if not value:
+            self.message_cache.clear()
+            return
+        keep = {message.id for message in value}
+        for message in [m for m in self.message_cache if m.id not in keep]:
+            self.message_cache.remove(message)
+
+    def _get_message(self, msg_id: int) -> Optional[discord.Message]:
+        return self.message_cache.get(msg_id)
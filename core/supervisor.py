@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+__all__ = ("SupervisedTask", "Supervisor")
+
+log = logging.getLogger(__name__)
+
+
+class SupervisedTask:
+    """A background task that gets restarted when it fails.
+
+    With an ``interval`` the function is called every ``interval`` seconds, otherwise it is a
+    long-running function that only gets restarted if it raises. Failures are retried after an
+    exponential backoff with jitter, so tasks failing together don't retry together.
+    """
+
+    def __init__(
+        self,
+        bot,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        *,
+        interval: Optional[float] = None,
+        ready: bool = False,
+        min_backoff: float = 1.0,
+        max_backoff: float = 300.0,
+    ) -> None:
+        self.bot = bot
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.ready = ready
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self.state = "pending"
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.restarts = 0
+        self.last_duration: Optional[float] = None
+        self.average_duration: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.last_failure: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = self.bot.loop.create_task(self._run())
+
+    def stop(self) -> None:
+        """Lets the current iteration of a periodic task finish, then stops.
+
+        Long-running tasks have no iteration to wait for, those are cancelled.
+        """
+        self._stopping = True
+        if self.interval is None or self.state != "running":
+            self.cancel()
+
+    def cancel(self) -> None:
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+        self.state = "stopped"
+
+    def restart(self) -> None:
+        """Cancels the current run and starts over right away, without counting it as a failure."""
+        if self._task is not None:
+            self._task.cancel()
+        self.restarts += 1
+        self.start()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _backoff(self) -> float:
+        delay = min(self.max_backoff, self.min_backoff * 2 ** (self.consecutive_failures - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _run(self) -> None:
+        if self.ready:
+            await self.bot.wait_until_ready()
+
+        while not self._stopping and not self.bot.is_closed():
+            self.state = "running"
+            start = time.perf_counter()
+            try:
+                await self.func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                # before the backoff, which isn't part of the run
+                self._record(time.perf_counter() - start)
+                self.failures += 1
+                self.consecutive_failures += 1
+                self.last_failure = time.time()
+                self.last_error = f"{type(err).__name__}: {err}"
+                delay = self._backoff()
+                log.exception(f"Task {self.name} failed, retrying in {delay:.1f}s.")
+                self.state = "backoff"
+                await asyncio.sleep(delay)
+                continue
+
+            self._record(time.perf_counter() - start)
+            self.consecutive_failures = 0
+            self.last_success = time.time()
+            if self.interval is None:
+                break
+            self.state = "sleeping"
+            await asyncio.sleep(self.interval)
+
+        self.state = "stopped"
+
+    def _record(self, duration: float) -> None:
+        self.runs += 1
+        self.last_duration = duration
+        if self.average_duration is None:
+            self.average_duration = duration
+        else:
+            self.average_duration = 0.8 * self.average_duration + 0.2 * duration
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(seconds: Optional[float]) -> Optional[float]:
+            return None if seconds is None else round(seconds * 1000, 2)
+
+        return {
+            "state": self.state,
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "restarts": self.restarts,
+            "last_duration": ms(self.last_duration),
+            "average_duration": ms(self.average_duration),
+            "last_success": self.last_success,
+            "last_failure": self.last_failure,
+            "last_error": self.last_error,
+        }
+
+
+class Supervisor:
+    """Keeps track of every :class:`SupervisedTask` of the bot, by name."""
+
+    def __init__(self, bot) -> None:
+        self.bot = bot
+        self.tasks: Dict[str, SupervisedTask] = {}
+
+    def register(self, name: str, func: Callable[[], Awaitable[Any]], **kwargs) -> SupervisedTask:
+        """Starts a task, a task already registered under the name (e.g. before a reload) is stopped."""
+        if (old := self.tasks.get(name)) is not None:
+            old.stop()
+        task = self.tasks[name] = SupervisedTask(self.bot, name, func, **kwargs)
+        task.start()
+        return task
+
+    def get(self, name: str) -> Optional[SupervisedTask]:
+        return self.tasks.get(name)
+
+    def stop(self, name: str) -> None:
+        if (task := self.tasks.get(name)) is not None:
+            task.stop()
+
+    def cancel(self, name: str) -> None:
+        if (task := self.tasks.get(name)) is not None:
+            task.cancel()
+
+    def restart(self, name: str) -> None:
+        if (task := self.tasks.get(name)) is not None:
+            task.restart()
+
+    async def close(self, timeout: float) -> None:
+        """Stops every task, iterations still running get ``timeout`` seconds to finish."""
+        for task in self.tasks.values():
+            task.stop()
+        running = [task._task for task in self.tasks.values() if task.running]
+        if running:
+            _, pending = await asyncio.wait(running, timeout=timeout)
+            if pending:
+                log.warning(f"Cancelling {len(pending)} background tasks still running.")
+        for task in self.tasks.values():
+            task.cancel()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: task.stats() for name, task in self.tasks.items()}
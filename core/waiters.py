@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import discord
+
+__all__ = ("WaiterRegistry",)
+
+log = logging.getLogger(__name__)
+
+Key = Tuple[int, int]
+Check = Callable[[discord.Message], bool]
+
+
+class WaiterRegistry:
+    """Waits for the next message of an author in a channel.
+
+    :meth:`discord.Client.wait_for` runs every pending check on every message, this looks the
+    waiters up by ``(channel_id, author_id)`` instead, so only their checks run.
+    """
+
+    def __init__(self, bot) -> None:
+        self.bot = bot
+        self._waiters: Dict[Key, List[Tuple[asyncio.Future, Optional[Check]]]] = {}
+        self.bot.add_listener(self.on_message)
+
+    def __len__(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    async def wait(
+        self, channel_id: int, author_id: int, *, timeout: Optional[float] = None, check: Optional[Check] = None
+    ) -> discord.Message:
+        """Returns the next message passing ``check``, raises :exc:`asyncio.TimeoutError` like ``wait_for``."""
+        key = (channel_id, author_id)
+        future = asyncio.get_running_loop().create_future()
+        waiter = (future, check)
+        self._waiters.setdefault(key, []).append(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            waiters = self._waiters.get(key)
+            if waiters is not None and waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._waiters[key]
+
+    async def on_message(self, message: discord.Message):
+        waiters = self._waiters.get((message.channel.id, message.author.id))
+        if not waiters:
+            return
+
+        for future, check in tuple(waiters):
+            if future.done():
+                continue
+            try:
+                if check is None or check(message):
+                    future.set_result(message)
+            except Exception as err:
+                future.set_exception(err)
@@ -13,7 +13,6 @@ import core
 from config import osu
 from utils import MENTION_REGEX
 from utils.buttons import StopButton
-from utils.decos import wait_until_ready
 
 EMOJIS = {
     "Main": "<:osu:850783495386300416>",
@@ -71,12 +70,23 @@ OSU_PROFILE_REGEX = re.compile(r"https?://osu\.ppy\.sh/users/(?P<id>[0-9]+)")
 OsuConverterResponse = NamedTuple("ConverterResponse", [("search", Union[int, str]), ("type", str)])
 
 
+async def get_registered(ctx: "core.Context", snowflake: int):
+    # register_user invalidates the tag, released right away since the osu! API is called next
+    async with ctx.db:
+        return await ctx.bot.pool.call_cached(
+            "games.lookup",
+            "osu",
+            snowflake,
+            ttl=600,
+            tags=(f"games:osu:{snowflake}",),
+            connection=ctx.db,
+        )
+
+
 class OsuUserConverter(commands.Converter):
     async def convert(self, ctx: "core.Context", argument) -> OsuConverterResponse:
         if argument is None:
-            _id = await ctx.bot.pool.fetchval(
-                "SELECT id FROM users.games WHERE game = 'osu' AND snowflake = $1", ctx.author.id
-            )
+            _id = await get_registered(ctx, ctx.author.id)
             if _id is None:
                 raise commands.BadArgument("You are not registered.")
             return OsuConverterResponse(search=_id, type="id")
@@ -84,9 +94,7 @@ class OsuUserConverter(commands.Converter):
             return OsuConverterResponse(search=str(url_match["id"]), type="id")
         if mention_match := MENTION_REGEX.fullmatch(argument):
             snowflake = int(mention_match["id"])
-            _id = await ctx.bot.pool.fetchval(
-                "SELECT id FROM users.games WHERE game = 'osu' AND snowflake = $1", snowflake
-            )
+            _id = await get_registered(ctx, snowflake)
             if _id is None:
                 raise commands.BadArgument(
                     "That user is not registered." if _id != ctx.author.id else "You are not registered."
@@ -103,10 +111,13 @@ class Osu(commands.Cog):
         self.show_subcommands = True
 
         self.headers = {"Authorization": None}
+        self._authorized = asyncio.Event()
+
+        bot.supervisor.register("osu_token", self.acquire_bearer_token, ready=True)
 
-        bot.loop.create_task(self.acquire_bearer_token())
+    def cog_unload(self):
+        self.bot.supervisor.cancel("osu_token")
 
-    @wait_until_ready()
     async def acquire_bearer_token(self):
         url = "https://osu.ppy.sh/oauth/token"
         data = {
@@ -118,13 +129,20 @@ class Osu(commands.Cog):
         while not self.bot.is_closed():
             async with self.bot.session.post(url, json=data) as r:
                 try:
-                    data = await r.json()
+                    token = await r.json()
                 except aiohttp.ContentTypeError:
-                    log.warning(f"OSU api responded with text/html: {await r.json()}")
-            self.headers["Authorization"] = "Bearer " + data["access_token"]
-            await asyncio.sleep(data["expires_in"])
+                    # the supervisor retries with a backoff
+                    raise RuntimeError(f"OSU api responded with text/html: {await r.text()}")
+            self.headers["Authorization"] = "Bearer " + token["access_token"]
+            self._authorized.set()
+            await asyncio.sleep(token["expires_in"])
 
     async def get_user(self, search: OsuConverterResponse) -> dict:
+        # the cog might have just been loaded lazily, so the token could still be on its way
+        try:
+            await asyncio.wait_for(self._authorized.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            raise commands.BadArgument("The osu! API is not available right now, try again later.")
         url = API_URL + f"/users/{search.search}/osu?key={search.type}"
         async with self.bot.session.get(url, headers=self.headers) as r:
             if r.status == 404:
@@ -218,7 +236,8 @@ class Osu(commands.Cog):
         """
         data = await self.get_user(query)
 
-        await self.bot.pool.register_user("osu", ctx.author.id, str(data["id"]))
+        async with ctx.db:
+            await self.bot.pool.register_user("osu", ctx.author.id, str(data["id"]), connection=ctx.db)
         await ctx.send("Registered you into the database.")
 
 
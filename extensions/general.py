@@ -61,7 +61,7 @@ class General(commands.Cog):
         self.emoji = "<a:pop_cat:854027957878390784>"
 
     async def send_socket_stats(self, ctx, stats, *, omit_minutes: bool = False) -> None:
-        minutes = (discord.utils.utcnow() - self.bot.start_time).total_seconds() / 60
+        minutes = (discord.utils.utcnow() - self.bot.extra.since).total_seconds() / 60
         total = 0
         lines = []
 
@@ -87,46 +87,35 @@ class General(commands.Cog):
     async def socket(self, ctx: core.Context):
         await self.send_socket_stats(ctx, self.bot.extra.socket_stats.most_common())
 
-    @socket.command(name="total", aliases=("all",), returns="A table showing the total socket stats")
+    @socket.command(
+        name="total",
+        aliases=("all",),
+        returns="A table showing the total socket stats",
+        cache=core.CacheSpec(ttl=300),
+    )
     async def socket_total(self, ctx: core.Context):
+        # the response is cached by CacheSpec already
         raw = await self.bot.pool.fetch("SELECT name, count FROM stats.socket ORDER BY count DESC")
         stats = [(i["name"], i["count"]) for i in raw]
         await self.send_socket_stats(ctx, stats, omit_minutes=True)
 
-    @core.command(returns="Things about the bot.")
+    @core.command(returns="Things about the bot.", cache=core.CacheSpec(ttl=60))
     async def about(self, ctx: core.Context):
         embed = self.bot.embed(color=discord.Color.og_blurple())
 
         me = await self.bot.getch_user(self.bot.owner_id)
         embed.set_author(name=str(me))
 
-        guilds = users = bots = text = voice = 0
-        for guild in self.bot.guilds:
-            guilds += 1
-            if guild.unavailable is True:
-                continue
-
-            for user in guild.members:
-                if user.bot is True:
-                    bots += 1
-                else:
-                    users += 1
+        stats = await self.bot.cluster_stats()
+        guilds, text, voice = (stats[k] for k in ("guilds", "text", "voice"))
+        members = f"{stats['members']:,} total"
 
-            for channel in guild.channels:
-                if isinstance(channel, discord.TextChannel):
-                    text += 1
-                if isinstance(channel, discord.VoiceChannel):
-                    voice += 1
-
-        cmds = await self.bot.pool.fetchval("SELECT COUNT(*) FROM stats.commands")
-        socket = await self.bot.pool.fetch("SELECT * FROM stats.socket")
-        total = 0
-        total_messages = 0
-        for stat in socket:
-            total += stat["count"]
-            if stat["name"] == "MESSAGE_CREATE":
-                total_messages = stat["count"]
-        since_restart = sum(self.bot.extra.command_stats.values())
+        extra = self.bot.extra
+        cmds, socket = await self.bot.totals()
+        total = sum(socket.values())
+        total_messages = socket["MESSAGE_CREATE"]
+        recent = sum(extra.command_stats.values())
+        since = discord.utils.format_dt(extra.since, "d")
 
         links = (
             f'[Support Server](https://google.com "Join the support server!")\n'
@@ -135,11 +124,11 @@ class General(commands.Cog):
         )
 
         fields = (
-            ("Users", f"{(users + bots):,} total\n{users:,} humans\n{bots:,} robots", True),
+            ("Users", members, True),
             ("Channels", f"{(text + voice):,} total\n{text:,} text\n{voice:,} voice", True),
             ("Links", links, True),
             ("Guilds", f"{guilds:,}", True),
-            ("Command Usage", f"{cmds:,} total\n{since_restart:,} since restart", True),
+            ("Command Usage", f"{cmds:,} total\n{recent:,} since {since}", True),
             ("Events", f"{total_messages:,} total messages seen\n{total:,} total socket events", True),
         )
 
@@ -148,9 +137,11 @@ class General(commands.Cog):
 
         await ctx.send(embed=embed)
 
-    @core.command(aliases=("codestats", "lines"), returns="Various code stats about me!")
+    @core.command(
+        aliases=("codestats", "lines"), returns="Various code stats about me!", cache=core.CacheSpec(ttl=3600)
+    )
     async def code_stats(self, ctx: core.Context):
-        stats = LineCounter.project()
+        stats = await self.bot.offload(LineCounter.project, deadline=30)
         await ctx.send(
             codeblock(
                 text="\n".join(
@@ -5,7 +5,6 @@ from random import choice
 from typing import List, Optional
 
 import discord
-from discord import utils
 from discord.ext import commands
 
 import core
@@ -90,9 +89,8 @@ async def get_winners(ctx: core.Context, argument: str) -> Optional[int]:
 
 
 async def wait_for(ctx: core.Context) -> Optional[str]:
-    check = lambda m: m.author == ctx.author and m.channel == ctx.channel
     try:
-        message: discord.Message = await ctx.bot.wait_for("message", check=check, timeout=120)
+        message: discord.Message = await ctx.wait_for_message(timeout=120)
     except asyncio.TimeoutError:
         await ctx.send(
             f"{random_tada()} {ctx.author.mention}, hi, sorry, you need to answer each question within 2 minutes."
@@ -196,6 +194,8 @@ class Giveaways(commands.Cog):
             embed.title = "Last chance to enter!"
 
         message = await channel.send(embed=embed)
+        # the reactions are read from the cached message when the giveaway ends
+        self.bot.messages.pin(message.id)
         await message.add_reaction(selected_tada)
 
         m = await ctx.send(f"{random_tada()} Giveaway has been started in {channel.mention}!")
@@ -207,7 +207,7 @@ class Giveaways(commands.Cog):
             "winners": winners,
             "emoji": int(selected_tada.rstrip(">").split(":")[2]),
         }
-        await timer.create_timer("giveaway", utcnow(), expires, data)
+        await timer.create_timer("giveaway", utcnow(), expires, data, guild=channel.guild.id)
         await m.add_reaction("✅")
 
     @giveaway.command(name="reroll", aliases=("newwinner",))
@@ -264,16 +264,13 @@ class Giveaways(commands.Cog):
     async def on_giveaway_complete(self, reminder):
         data = reminder["data"]
         try:
-            channel: discord.TextChannel = self.bot.get_channel(data["channel"]) or (
-                await self.bot.fetch_channel(data["channel"])
-            )
+            channel: discord.TextChannel = await self.bot.resolver.channel(data["channel"])
         except discord.HTTPException:
             return
 
+        self.bot.messages.unpin(data["message"])
         try:
-            message = utils.get(self.bot.cached_messages, id=data["message"]) or (
-                await channel.fetch_message(data["message"])
-            )
+            message = await self.bot.resolver.message(channel, data["message"])
         except discord.HTTPException:
             return
 
@@ -304,8 +301,8 @@ class Giveaways(commands.Cog):
 
         new_kwargs = {"content": content}
 
-        await message.edit(**old_kwargs)
-        await message.reply(**new_kwargs)
+        await self.bot.outbox.edit(message, **old_kwargs)
+        await self.bot.outbox.send(message.channel, reference=message, **new_kwargs)
 
 
 def setup(bot: core.Bot):
@@ -20,11 +20,12 @@ class Interactions(commands.Cog):
         self.bot = bot
         self.emoji = "<:mitsuri_pleading:853237551262466108>"
 
-    async def construct_embed(
-        self, method: str, plural: str, initiator: discord.Member, receiver: discord.User
-    ) -> discord.Embed:
+    async def construct_embed(self, method: str, plural: str, vals: dict) -> discord.Embed:
         embed = self.bot.embed()
 
+        vals["plural"] = plural
+        embed.set_footer(text=fmt.format_map(vals))
+
         url = "https://api.waifu.pics/sfw/" + method
         async with self.bot.session.get(url) as resp:
             if resp.ok:
@@ -36,13 +37,11 @@ class Interactions(commands.Cog):
                 log.warning(f"Embed image failed to load. Method: {method}, Code: {resp.status}")
                 embed.description = "Oops, something went wrong."
 
-        vals = await self.get_totals(method, initiator, receiver)
-        vals["plural"] = plural
-        embed.set_footer(text=fmt.format_map(vals))
-
         return embed
 
-    async def get_totals(self, method: str, initiator: discord.User, receiver: discord.User) -> dict:
+    async def get_totals(
+        self, method: str, initiator: discord.User, receiver: discord.User, *, connection=None
+    ) -> dict:
         query = """
             SELECT
                 users.interactions.count AS amount, users.totals.count AS total
@@ -54,21 +53,12 @@ class Interactions(commands.Cog):
             WHERE
                 initiator = $1 AND receiver = $2 AND users.interactions.method = $3 AND users.totals.method = $3
             """
-        data = dict(await self.bot.pool.fetchrow(query, initiator.id, receiver.id, method))
+        data = dict(await (connection or self.bot.pool).fetchrow(query, initiator.id, receiver.id, method))
         data.update({"user": receiver.display_name})
         return data
 
-    async def update(self, method: str, initiator: discord.User, receiver: discord.User):
-        query = """
-            WITH total_update AS (
-                INSERT INTO users.totals (method, snowflake) VALUES ($1, $3)
-                ON CONFLICT (method, snowflake) DO UPDATE SET count = totals.count + 1
-            )
-            INSERT INTO users.interactions (method, initiator, receiver) VALUES ($1, $2, $3)
-            ON CONFLICT (method, initiator, receiver) DO UPDATE
-            SET count = interactions.count + 1
-            """
-        await self.bot.pool.execute(query, method, initiator.id, receiver.id)
+    async def update(self, method: str, initiator: discord.User, receiver: discord.User, *, connection=None):
+        await (connection or self.bot.pool).call("interactions.update", method, initiator.id, receiver.id)
 
     def invoke_check(self, verb: str, plural: str, initiator: discord.User, receiver: discord.User):
         if initiator == receiver:
@@ -80,9 +70,12 @@ class Interactions(commands.Cog):
         self, ctx: core.Context, verb: str, plural: str, initiator: discord.Member, receiver: discord.User
     ):
         self.invoke_check(verb, plural, initiator, receiver)
-        await self.update(verb, initiator, receiver)
+        async with ctx.db:
+            await self.update(verb, initiator, receiver, connection=ctx.db)
+            totals = await self.get_totals(verb, initiator, receiver, connection=ctx.db)
 
-        await ctx.send(embed=await self.construct_embed(verb, plural, initiator, receiver))
+        # the image fetch and the send don't need the connection
+        await ctx.send(embed=await self.construct_embed(verb, plural, totals))
 
     @core.command(
         examples=("@ppotatoo",),
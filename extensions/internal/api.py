@@ -1,10 +1,10 @@
+import asyncio
 import json
 import logging
-from typing import Dict, Union
+from typing import Dict, Optional, Union
 
-import discord
 from aiohttp import web
-from discord.ext import commands, tasks
+from discord.ext import commands
 
 import core
 from config import gist
@@ -21,6 +21,8 @@ class APIHandler:
         self.app = web.Application()
         self.runner = web.AppRunner(self.app, access_log=log)
         self.site = None
+        # the handler of a previous BackendAPI cog, which has to let go of the port first
+        self.previous: Optional[asyncio.Task] = None
         self.bot.loop.create_task(self.run())
 
     def generate_routes(self) -> tuple:
@@ -31,6 +33,12 @@ class APIHandler:
             web.get(f"{prefix}/stats", handler=self.stats),
             web.get(f"{prefix}/socket", handler=self.socket),
             web.get(f"{prefix}/cogs", handler=self.cogs),
+            web.get(f"{prefix}/outbox", handler=self.outbox),
+            web.get(f"{prefix}/cache", handler=self.cache),
+            web.get(f"{prefix}/tasks", handler=self.tasks),
+            web.get(f"{prefix}/offload", handler=self.offload),
+            web.get(f"{prefix}/queries", handler=self.queries),
+            web.get(f"{prefix}/pool", handler=self.pool),
         )
 
     async def all(self, request):
@@ -51,50 +59,69 @@ class APIHandler:
     async def cogs(self, request):
         return web.json_response(self.json.generate_cogs())
 
+    async def outbox(self, request):
+        return web.json_response(self.bot.outbox.stats())
+
+    async def cache(self, request):
+        return web.json_response(self.bot.responses.stats())
+
+    async def tasks(self, request):
+        return web.json_response(self.bot.supervisor.stats())
+
+    async def offload(self, request):
+        return web.json_response(self.bot.offload.stats())
+
+    async def queries(self, request):
+        pool = self.bot.pool
+        return web.json_response({**pool.stats.to_dict(), "cache": pool.cache.stats()})
+
+    async def pool(self, request):
+        return web.json_response(self.bot.pool.pool_stats())
+
     async def run(self):
+        if self.previous is not None:
+            await self.previous
         self.app.add_routes(self.generate_routes())
 
         await self.runner.setup()
-        self.site = web.TCPSite(self.runner, "localhost", 8080)
+        # every cluster gets its own port, cluster 0 (or an unclustered bot) keeps 8080
+        self.site = web.TCPSite(self.runner, "localhost", 8080 + (self.bot.cluster_id or 0))
         await self.site.start()
 
         log.info("Backend JSON API started up.")
 
+    async def close(self):
+        if self.site is None:
+            return
+        self.site = None
+        await self.runner.cleanup()
+        log.info("Backend JSON API shut down.")
+
 
 class JSONHandler:
     def __init__(self, bot: core.Bot) -> None:
         self.bot = bot
 
     async def generate_stats(self) -> Dict[str, int]:
-        data = {
-            "guilds": 0,
-            "unique_users": len(self.bot.users),
-            "total_members": 0,
+        stats = await self.bot.cluster_stats()
+        commands_run, _ = await self.bot.totals()
+        return {
+            "guilds": stats["guilds"],
+            "unique_users": stats["users"],
+            "total_members": stats["members"],
             "total_commands": len(
                 tuple(
                     i for i in self.bot.walk_commands() if i.cog is not None and not i.cog.qualified_name == "Jishaku"
                 )
             ),
-            "total_commands_run": await self.bot.pool.fetchval("SELECT COUNT(*) FROM stats.commands"),
-            "text_channels": 0,
-            "voice_channels": 0,
+            "total_commands_run": commands_run,
+            "text_channels": stats["text"],
+            "voice_channels": stats["voice"],
         }
-        for guild in self.bot.guilds:
-            data["guilds"] += 1
-            if guild.unavailable:
-                continue
-
-            data["total_members"] += guild.member_count
-            for channel in guild.channels:
-                if isinstance(channel, discord.TextChannel):
-                    data["text_channels"] += 1
-                elif isinstance(channel, discord.VoiceChannel):
-                    data["voice_channels"] += 1
-
-        return data
 
     async def generate_socket(self) -> Dict[str, int]:
-        return dict(await self.bot.pool.fetch("SELECT * FROM stats.socket"))
+        _, socket = await self.bot.totals()
+        return dict(socket)
 
     def generate_command(self, command: commands.Command) -> dict:
         data = {
@@ -130,14 +157,21 @@ class JSONHandler:
         return data
 
     def generate_cogs(self):
+        metadata = self.bot.extra.cog_metadata
         data = {}
         for cog_name, cog in self.bot.cogs.items():
             if getattr(cog, "emoji", None) is None:
                 continue
-            cdata = {"description": cog.description, "commands": {}}
-            for command in cog.get_commands():
-                cdata["commands"][command.name] = self.generate_command(command)
-            data[cog_name] = cdata
+            if cog_name not in metadata:
+                cdata = {"description": cog.description, "commands": {}}
+                for command in cog.get_commands():
+                    cdata["commands"][command.name] = self.generate_command(command)
+                metadata[cog_name] = cdata
+            data[cog_name] = metadata[cog_name]
+
+        # cogs that are not loaded yet get served from the snapshot
+        for cog_name, cdata in metadata.items():
+            data.setdefault(cog_name, cdata)
 
         return data
 
@@ -157,26 +191,30 @@ class BackendAPI(commands.Cog):
             "User-Agent": "ppotatoo",
             "Accept": "application/vnd.github.v3+json",
         }
-        self.gist_update.start()
+        # one gist for every cluster
+        if not self.bot.cluster_id:
+            self.bot.supervisor.register("gist_update", self.gist_update, interval=1800, ready=True)
 
         self.api = APIHandler(self.bot)
 
     def cog_unload(self):
-        self.gist_update.stop()
+        self.bot.supervisor.stop("gist_update")
+        self._closing = self.bot.loop.create_task(self.api.close())
+
+    def export_state(self) -> dict:
+        return {"closing": self._closing}
+
+    def import_state(self, state: dict) -> None:
+        self.api.previous = state["closing"]
 
-    @tasks.loop(minutes=30)
     async def gist_update(self):
-        content = json.dumps(await self.api.json.generate_all(), indent=4)
+        content = await self.bot.offload(json.dumps, await self.api.json.generate_all(), indent=4, deadline=30)
         description = f"Last updated at {utcnow()}"
         data = {"description": description, "files": {"data.json": {"content": content}}}
         url = "https://api.github.com/gists/" + gist.id
         async with self.bot.session.patch(url, json=data, headers=self.headers) as resp:
             log.info("Posted stats to gist.")
 
-    @gist_update.before_loop
-    async def wait(self):
-        await self.bot.wait_until_ready()
-
 
 def setup(bot: core.Bot):
     bot.add_cog(BackendAPI(bot))
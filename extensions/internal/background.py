@@ -1,13 +1,11 @@
 import asyncio
 from collections import Counter
-from json import dumps
 from logging import getLogger
 
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 
 import core
-from utils.decos import wait_until_prepped
 
 __all__ = ("setup",)
 
@@ -20,78 +18,91 @@ class BackgroundEvents(commands.Cog):
         self._lock = asyncio.Lock(loop=self.bot.loop)
 
         self._command_cache = []
-        self._socket_cache = Counter()
         self._nicknames_cache = []
         self._usernames_cache = []
 
-        self.bulk_insert.start()
+        self.bot.supervisor.register("bulk_insert", self.bulk_insert, interval=10)
 
     def cog_unload(self):
-        self.bulk_insert.stop()
+        self.bot.supervisor.stop("bulk_insert")
+
+    def export_state(self) -> dict:
+        # the lock goes along, a flush of the old cog may still be running and clears the buffers after it
+        return {
+            "lock": self._lock,
+            "commands": self._command_cache,
+            "nicknames": self._nicknames_cache,
+            "usernames": self._usernames_cache,
+        }
+
+    def import_state(self, state: dict) -> None:
+        # the same lists, not copies, so rows the old flush already wrote get cleared
+        self._lock = state["lock"]
+        self._command_cache = state["commands"]
+        self._nicknames_cache = state["nicknames"]
+        self._usernames_cache = state["usernames"]
 
-    @tasks.loop(seconds=10)
-    @wait_until_prepped()
     async def bulk_insert(self):
-        if self.bot.is_closed():
-            return
-        async with self.bot.pool.acquire() as conn:
+        await self.bot.prepped.wait()
+        await self.flush()
+
+    async def flush(self):
+        """Writes every buffer to the database, also called by Bot.close."""
+        pool = self.bot.pool
+        async with pool.acquire() as conn:
             if self._command_cache:
                 async with self._lock:
-                    query = """
-                        INSERT INTO
-                            stats.commands (guild, channel, author, used, prefix, command, failed)
-                        SELECT x.guild, x.channel, x.author, x.used, x.prefix, x.command, x.failed
-                            FROM JSONB_TO_RECORDSET($1::JSONB) AS
-                            x(
-                                    guild BIGINT,
-                                    channel BIGINT,
-                                    author BIGINT,
-                                    used TIMESTAMP,
-                                    prefix TEXT,
-                                    command TEXT,
-                                    failed BOOLEAN
-                            )
-                            """
-                    await conn.execute(query, dumps(self._command_cache))
+                    await pool.command_insert(self._command_cache, connection=conn)
+                    self.bot.extra.commands_flushed += len(self._command_cache)
                     self._command_cache.clear()
 
             if self._nicknames_cache:
                 async with self._lock:
-                    query = """
-                        INSERT INTO
-                            users.nicknames (guild, member, nickname)
-                        SELECT x.guild, x.member, x.nickname
-                        FROM JSONB_TO_RECORDSET($1::JSONB)
-                        AS x(guild BIGINT, member BIGINT, nickname TEXT)
-                        """
-                    await conn.execute(query, dumps(self._nicknames_cache))
+                    await pool.copy_records(
+                        "nicknames",
+                        self._nicknames_cache,
+                        columns=("guild", "member", "nickname"),
+                        schema="users",
+                        connection=conn,
+                    )
                     self._nicknames_cache.clear()
 
             if self._usernames_cache:
                 async with self._lock:
-                    query = """
-                        INSERT INTO
-                            users.usernames (snowflake, username)
-                        SELECT x.snowflake, x.username
-                        FROM JSONB_TO_RECORDSET($1::JSONB)
-                        AS x(snowflake BIGINT, username TEXT)
-                        """
-                    await conn.execute(query, dumps(self._usernames_cache))
+                    await pool.copy_records(
+                        "usernames",
+                        self._usernames_cache,
+                        columns=("snowflake", "username"),
+                        schema="users",
+                        connection=conn,
+                    )
                     self._usernames_cache.clear()
 
-            if self._socket_cache:
+            if self.bot.extra.socket_pending:
                 async with self._lock:
-                    items = [(name, count) for name, count in self._socket_cache.most_common()]
+                    # events keep getting counted while this runs, so they go into a new counter
+                    pending, self.bot.extra.socket_pending = self.bot.extra.socket_pending, Counter()
                     query = """
-                        INSERT INTO 
-                            stats.socket
-                        VALUES ($1, $2)
+                        INSERT INTO
+                            stats.socket (name, count)
+                        SELECT name, count FROM {staging}
                         ON CONFLICT (name)
-                        DO UPDATE SET 
-                            count = socket.count + $2
+                        DO UPDATE SET
+                            count = socket.count + EXCLUDED.count
                         """
-                    await conn.executemany(query, items)
-                    self._socket_cache.clear()
+                    try:
+                        await pool.copy_merge(
+                            "socket",
+                            list(pending.items()),
+                            columns=("name", "count"),
+                            merge=query,
+                            schema="stats",
+                            connection=conn,
+                        )
+                    except Exception:
+                        self.bot.extra.socket_pending.update(pending)
+                        raise
+                    self.bot.extra.socket_flushed.update(pending)
 
     @commands.Cog.listener()
     async def on_command_completion(self, ctx: core.Context):
@@ -99,37 +110,32 @@ class BackgroundEvents(commands.Cog):
             return
 
         self.bot.extra.command_stats[ctx.command.qualified_name] += 1
+        self.bot.extra.commands_total += 1
         async with self._lock:
             self._command_cache.append(
-                {
-                    "guild": getattr(ctx.guild, "id", None),
-                    "channel": ctx.channel.id,
-                    "author": ctx.author.id,
-                    "used": ctx.message.created_at.isoformat(),
-                    "prefix": ctx.clean_prefix,
-                    "command": ctx.command.qualified_name,
-                    "failed": ctx.command_failed,
-                }
+                (
+                    getattr(ctx.guild, "id", None),
+                    ctx.channel.id,
+                    ctx.author.id,
+                    # the column is a naive TIMESTAMP in UTC
+                    ctx.message.created_at.replace(tzinfo=None),
+                    ctx.clean_prefix,
+                    ctx.command.qualified_name,
+                    ctx.command_failed,
+                )
             )
 
-    @commands.Cog.listener()
-    async def on_socket_response(self, data):
-        if event := data.get("t"):
-            self.bot.extra.socket_stats[event] += 1
-
-            self._socket_cache[event] += 1
-
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Member, after: discord.Member):
         if before.display_name != after.display_name and after.nick is not None:
             async with self._lock:
-                self._nicknames_cache.append({"guild": after.guild.id, "member": after.id, "nickname": after.nick})
+                self._nicknames_cache.append((after.guild.id, after.id, after.nick))
 
     @commands.Cog.listener()
     async def on_user_update(self, before: discord.User, after: discord.User):
         if before.name != after.name:
             async with self._lock:
-                self._usernames_cache.append({"snowflake": after.id, "username": after.name})
+                self._usernames_cache.append((after.id, after.name))
 
 
 def setup(bot: core.Bot):
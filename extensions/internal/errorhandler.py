@@ -5,6 +5,7 @@ import discord
 from discord.ext import commands
 
 import core
+from core.access import Blocked, DisabledHere
 
 __all__ = ("setup",)
 
@@ -31,10 +32,18 @@ class ErrorHandler(commands.Cog):
 
         error = getattr(error, "original", error)
 
+        if isinstance(error, Blocked):
+            return
+
         if ctx.command and not isinstance(error, commands.CommandOnCooldown):
             ctx.command.reset_cooldown(ctx)
 
-        simple_errors = (commands.BadArgument, commands.BotMissingPermissions, commands.MissingPermissions)
+        simple_errors = (
+            commands.BadArgument,
+            commands.BotMissingPermissions,
+            commands.MissingPermissions,
+            DisabledHere,
+        )
 
         if isinstance(error, simple_errors):
             return await ctx.send(embed=self.bot.embed(title=str(error)))
@@ -61,7 +70,13 @@ class ErrorHandler(commands.Cog):
         if isinstance(error, asyncio.TimeoutError):
             return await ctx.send(embed=self.bot.embed(description=f"{ctx.invoked_with} timed out."))
 
-        traceback = "".join(format_exception(type(error), error, error.__traceback__))
+        exc_info = (type(error), error, error.__traceback__)
+        try:
+            lines = await self.bot.offload(format_exception, *exc_info, deadline=5)
+        except asyncio.TimeoutError:
+            # the workers are busy, formatting inline still beats losing the error
+            lines = format_exception(*exc_info)
+        traceback = "".join(lines)
         if len(traceback) > 2000:
             traceback = await self.bot.paste(traceback)
         else:
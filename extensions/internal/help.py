@@ -82,6 +82,12 @@ class GroupSource(menus.ListButtonSource):
 class CustomHelp(commands.HelpCommand):
     context: core.Context
 
+    async def prepare_help_command(self, ctx: core.Context, command=None):
+        # help needs every command, not the stubs of lazily loaded extensions
+        if ctx.bot.lazy is not None:
+            ctx.bot.lazy.load_all()
+        await super().prepare_help_command(ctx, command)
+
     async def filter_commands(self, cmds, *, sort=True, key=None):
         if sort and key is None:
             key = lambda c: c.name
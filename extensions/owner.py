@@ -152,6 +152,42 @@ class Owner(commands.Cog, command_attrs=dict(hidden=True)):
                 value = stdout.getvalue()
                 return await ctx.send(f"```py\n{value}{exception}```"[:1990])
 
+    @core.group(invoke_without_command=True)
+    async def block(self, ctx: core.Context):
+        await ctx.send_help(ctx.command)
+
+    @block.command(name="user")
+    async def block_user(self, ctx: core.Context, user: discord.User, *, reason: str = None):
+        await self.bot.access.block(user.id, reason=reason)
+        await ctx.send(f"Blocked {user}.")
+
+    @block.command(name="guild")
+    async def block_guild(self, ctx: core.Context, guild_id: int, *, reason: str = None):
+        await self.bot.access.block(guild_id, guild=True, reason=reason)
+        await ctx.send(f"Blocked guild `{guild_id}`.")
+
+    @core.command()
+    async def unblock(self, ctx: core.Context, snowflake: int):
+        await self.bot.access.unblock(snowflake)
+        await ctx.send(f"Unblocked `{snowflake}`.")
+
+    @core.command()
+    async def tasks(self, ctx: core.Context):
+        """Shows the background tasks and how they are doing."""
+        rows = [
+            {
+                "task": name,
+                "state": stats["state"],
+                "runs": stats["runs"],
+                "failures": stats["failures"],
+                "restarts": stats["restarts"],
+                "avg ms": stats["average_duration"],
+                "last error": (stats["last_error"] or "")[:40],
+            }
+            for name, stats in self.bot.supervisor.stats().items()
+        ]
+        await ctx.send(codeblock(tabulate(rows, headers="keys", tablefmt="github")))
+
     @core.group()
     async def sql(self, ctx: core.Context):
         if not ctx.invoked_subcommand:
@@ -167,7 +203,7 @@ class Owner(commands.Cog, command_attrs=dict(hidden=True)):
     async def fetch(self, ctx: core.Context, *, query: str):
         with Timer() as timer:
             ret = await self.pool.fetch(query.strip("`"))
-        table = tabulate((dict(row) for row in ret), headers="keys", tablefmt="github")
+        table = await self.bot.offload(tabulate, [dict(row) for row in ret], headers="keys", tablefmt="github")
         if len(table) > 1000:
             table = await self.bot.paste(table)
         await ctx.send(f"{codeblock(table)}\n**Retrieved {len(ret)} rows in {timer.exact}**")
@@ -178,6 +214,36 @@ class Owner(commands.Cog, command_attrs=dict(hidden=True)):
             ret = await self.pool.fetchval(query.strip("`"))
         await ctx.send(f"{codeblock(f'{ret!r}')}\n**Retrieved in {timer.exact}**")
 
+    @sql.command(name="stats")
+    async def sql_stats(self, ctx: core.Context, limit: int = 10):
+        """The queries taking the most time in total, times are in ms."""
+        stats = self.pool.stats
+        rows = [{**query, "query": query["query"][:50]} for query in stats.query_stats()[:limit]]
+        table = await self.bot.offload(tabulate, rows, headers="keys", tablefmt="github")
+        if len(table) > 1500:
+            table = await self.bot.paste(table)
+        acquire = stats.acquire_stats()
+        cache = self.pool.cache.stats()
+        limiter = self.pool.limiter.stats()
+        await ctx.send(
+            f"{codeblock(table)}\n**Acquire wait** p50 {acquire['p50']}ms, p95 {acquire['p95']}ms, "
+            f"max {acquire['max']}ms\n**{len(stats.slow)} slow queries** over {stats.slow_query_ms}ms\n"
+            f"**Cache** {cache['hits']:,} hits, {cache['misses']:,} misses, {cache['entries']:,} entries\n"
+            f"**Pool** {limiter['in_use']}/{limiter['limit']} in use (max {limiter['max']}), "
+            f"{limiter['waiting']} waiting, saturated {limiter['saturated']} times"
+        )
+
+    @sql.command()
+    async def slow(self, ctx: core.Context, limit: int = 5):
+        """The latest slow queries, only the types of their arguments are kept."""
+        entries = list(self.pool.stats.slow)[-limit:]
+        if not entries:
+            return await ctx.send("No slow queries.")
+        text = "\n\n".join(f"-- {entry['ms']}ms, args {entry['args']}\n{entry['query']}" for entry in entries)
+        if len(text) > 1900:
+            return await ctx.send(await self.bot.paste(text))
+        await ctx.send(codeblock(text, lang="sql"))
+
     @sql.error
     async def sql_error(self, ctx: core.Context, error: Exception):
         if isinstance(error, commands.CommandInvokeError):
@@ -4,7 +4,6 @@ from datetime import datetime as dt
 from datetime import timedelta
 from json import dumps, loads
 
-import asyncpg
 import discord
 from discord.ext import commands
 
@@ -15,6 +14,10 @@ __all__ = ("setup",)
 
 log = logging.getLogger(__name__)
 
+# how long a claimed timer is left to its cluster, it is retried after that unless it was delivered
+LEASE = timedelta(minutes=5)
+MAX_ATTEMPTS = 3
+
 
 class Reminders(commands.Cog):
     def __init__(self, bot: core.Bot):
@@ -23,87 +26,110 @@ class Reminders(commands.Cog):
         self.show_subcommands = True
 
         self._current_timer = None
+        self._calling = None
         self._event = asyncio.Event(loop=self.bot.loop)
 
-        self._task = self.bot.loop.create_task(self._reminder_dispatch())
+        self.bot.supervisor.register("reminder_dispatch", self._reminder_dispatch)
+
+    def cog_unload(self):
+        self.bot.supervisor.cancel("reminder_dispatch")
+
+    async def stop(self):
+        """Stops dispatching timers, waiting for the timer being called to be delivered."""
+        self.bot.supervisor.cancel("reminder_dispatch")
+        if self._calling is not None:
+            # shielded, a caller timing out leaves the delivery running, or to the lease
+            await asyncio.shield(self._calling)
+
+    def export_state(self) -> dict:
+        return {"current_timer": self._current_timer}
+
+    def import_state(self, state: dict) -> None:
+        # the new dispatcher queries the next timer itself, this only keeps create_timer from
+        # missing an earlier timer in the meantime
+        if self._current_timer is None:
+            self._current_timer = state["current_timer"]
 
     async def get_active_reminder(self, days: int = 10, *, connection=None):
-        query = """
-            SELECT * 
-            FROM 
-                events.timers
-            WHERE
-                expires < (CURRENT_DATE + $1::interval) 
-            ORDER BY
-                expires 
-            LIMIT
-                1
-            """
         conn = connection or self.bot.pool
 
-        ret = await conn.fetchrow(query, timedelta(days=days))
+        shard_count = self.bot.shard_count or 1
+        shards = list(self.bot.shard_ids or range(shard_count))
+        ret = await conn.call("timers.next", timedelta(days=days), shard_count, shards)
         return ret or None
 
     async def wait_for_reminders(self, *, days=10):
-        async with self.bot.pool.acquire() as conn:
-            reminder = await self.get_active_reminder(days, connection=conn)
+        while True:
+            # cleared before looking, so a timer created meanwhile still sets it
+            self._event.clear()
+            reminder = await self.get_active_reminder(days)
             if reminder is not None:
-                self._event.set()
                 return reminder
 
-            self._event.clear()
-
             self._current_timer = None
-
-            await self._event.wait()
-
-            return await self.get_active_reminder(days, connection=conn)
+            try:
+                # looks again once in a while, for timers coming into the window and expired leases
+                await asyncio.wait_for(self._event.wait(), timeout=LEASE.total_seconds())
+            except asyncio.TimeoutError:
+                pass
 
     async def call_timer(self, reminder):
-        await self.bot.pool.execute("DELETE FROM events.timers WHERE id = $1", reminder["id"])
+        attempts = await self.bot.pool.call("timers.claim", reminder["id"], LEASE)
+        if attempts is None:
+            # another dispatcher holds the lease
+            return
         reminder = dict(reminder)
         reminder["data"] = loads(reminder["data"])
 
-        self.bot.dispatch(f"{reminder['event']}_complete", reminder)
+        # called rather than dispatched, the timer is only done once every listener got through it
+        event = f"on_{reminder['event']}_complete"
+        listeners = self.bot.extra_events.get(event, [])
+        results = await asyncio.gather(*(listener(reminder) for listener in listeners), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        for error in errors:
+            log.error(f"Timer {reminder['id']} failed in {event}.", exc_info=error)
+
+        if errors and attempts < MAX_ATTEMPTS:
+            log.warning(f"Retrying timer {reminder['id']} in {LEASE}, attempt {attempts} of {MAX_ATTEMPTS}.")
+            return
+        await self.bot.pool.call("timers.complete", reminder["id"])
 
     async def _reminder_dispatch(self):
+        # failures are retried by the supervisor
         await self.bot.wait_until_ready()
-        try:
-            while not self.bot.is_closed():
-                reminder = self._current_timer = await self.wait_for_reminders()
-
-                if (expires := reminder["expires"]) >= (now := utcnow()):
-                    to_sleep = (expires - now).total_seconds()
-                    await asyncio.sleep(to_sleep)
-
-                await self.call_timer(reminder)
-        except asyncio.CancelledError:
-            raise
-        except (OSError, discord.ConnectionClosed, asyncpg.PostgresConnectionError):
-            # re-run the loop
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self._reminder_dispatch())
-
-    async def create_timer(self, event: str, created: dt, expires: dt, data: dict):
+        while not self.bot.is_closed():
+            reminder = self._current_timer = await self.wait_for_reminders()
+
+            if (expires := reminder["expires"]) >= (now := utcnow()):
+                try:
+                    # create_timer sets the event for a sooner timer, which is then looked up instead
+                    await asyncio.wait_for(self._event.wait(), timeout=(expires - now).total_seconds())
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+
+            # a reload cancelling the dispatcher mid-call must not lose the timer
+            self._calling = self.bot.loop.create_task(self.call_timer(reminder))
+            await asyncio.shield(self._calling)
+            self._calling = None
+
+    async def create_timer(self, event: str, created: dt, expires: dt, data: dict, *, guild: int = None):
         query = """
             INSERT INTO
-                events.timers (event, created, expires, data)
+                events.timers (event, created, expires, data, guild)
             VALUES 
-                ($1, $2, $3, $4::JSONB)
+                ($1, $2, $3, $4::JSONB, $5)
             RETURNING * 
             """
-        values = (event, created, expires, dumps(data))
-        timer = await self.bot.pool.fetchrow(query, *values)
+        values = (event, created, expires, dumps(data), guild)
+        timer = await self.bot.pool.fetchrow(query, *values, primary=True)
 
         delta = (expires - created).total_seconds()
 
-        if delta <= (86400 * 10):
+        # wakes the dispatcher up, restarting it could cancel a delivery halfway
+        if delta <= (86400 * 10) and (self._current_timer is None or expires < self._current_timer["expires"]):
             self._event.set()
 
-        if self._current_timer and expires < self._current_timer["expires"]:
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self._reminder_dispatch())
-
         return timer
 
     @core.command(
@@ -133,7 +159,7 @@ class Reminders(commands.Cog):
             "reminder_content": _thing,
         }
 
-        await self.create_timer("reminder", ctx.message.created_at, expires, data)
+        await self.create_timer("reminder", ctx.message.created_at, expires, data, guild=getattr(ctx.guild, "id", None))
 
         delta = human_timedelta(expires, source=ctx.message.created_at)
         if _thing == "Nothing":
@@ -146,7 +172,7 @@ class Reminders(commands.Cog):
     async def on_reminder_complete(self, reminder):
         data = reminder["data"]
         try:
-            channel = self.bot.get_channel(data["channel"]) or (await self.bot.fetch_channel(data["channel"]))
+            channel = await self.bot.resolver.channel(data["channel"])
         except discord.HTTPException:
             return
 
@@ -156,7 +182,7 @@ class Reminders(commands.Cog):
         msg += "\n\n" + f"<https://discord.com/channels/{channel.guild.id}/{channel.id}/{data['message']}>"
 
         try:
-            await channel.send(msg)
+            await self.bot.outbox.send(channel, msg, merge=True)
         except discord.HTTPException:
             return
 
@@ -0,0 +1,122 @@
+from typing import List
+
+import discord
+from discord.ext import commands
+
+import core
+from utils import checks
+
+__all__ = ("setup",)
+
+
+class Settings(commands.Cog):
+    """Server settings, like prefixes"""
+
+    def __init__(self, bot: core.Bot):
+        self.bot = bot
+        self.emoji = "⚙️"
+        self.show_subcommands = True
+
+    @core.group(
+        aliases=("prefixes",),
+        returns="The prefixes I listen to in this server.",
+        invoke_without_command=True,
+    )
+    @commands.guild_only()
+    async def prefix(self, ctx: core.Context):
+        """Shows the prefixes for this server.
+        You can always mention me instead of using a prefix.
+        """
+        prefixes = self.bot.prefixes.get(ctx.guild.id)
+        await ctx.send(embed=self.bot.embed(title="Prefixes", description="\n".join(f"`{p}`" for p in prefixes)))
+
+    @prefix.command(
+        name="add",
+        examples=("!", '"hey bot "'),
+        params={"prefix": "The prefix to add. Wrap it in quotes if it has spaces."},
+        returns="Confirmation that the prefix was added.",
+    )
+    @checks.has_permissions(manage_guild=True)
+    async def prefix_add(self, ctx: core.Context, prefix: str):
+        """Adds a prefix to this server.
+        Adding a prefix replaces the default ones.
+        """
+        if len(prefix) > 25:
+            raise commands.BadArgument("Prefixes can't be longer than 25 characters.")
+        if len(self.bot.prefixes.custom(ctx.guild.id)) >= 10:
+            raise commands.BadArgument("You can't have more than 10 prefixes.")
+
+        await self.bot.prefixes.add(ctx.guild.id, prefix)
+        await ctx.send(f"Added `{prefix}` as a prefix.")
+
+    @prefix.command(
+        name="remove",
+        aliases=("delete",),
+        examples=("!",),
+        params={"prefix": "The prefix to remove."},
+        returns="Confirmation that the prefix was removed.",
+    )
+    @checks.has_permissions(manage_guild=True)
+    async def prefix_remove(self, ctx: core.Context, prefix: str):
+        """Removes a prefix from this server.
+        If you remove every prefix, I go back to the default ones.
+        """
+        if prefix not in self.bot.prefixes.custom(ctx.guild.id):
+            raise commands.BadArgument(f"`{prefix}` is not a custom prefix here.")
+
+        await self.bot.prefixes.remove(ctx.guild.id, prefix)
+        await ctx.send(f"Removed `{prefix}` from the prefixes.")
+
+    @prefix.command(name="reset", returns="Confirmation that the prefixes were reset.")
+    @checks.has_permissions(manage_guild=True)
+    async def prefix_reset(self, ctx: core.Context):
+        """Resets this server's prefixes back to the default ones."""
+        await self.bot.prefixes.reset(ctx.guild.id)
+        await ctx.send("Reset the prefixes.")
+
+    @core.command(
+        examples=("osu profile", "interactions"),
+        params={"command": "The command or category to disable, subcommands are disabled too."},
+        returns="Confirmation that the command was disabled.",
+    )
+    @commands.guild_only()
+    @checks.has_permissions(manage_guild=True)
+    async def disable(self, ctx: core.Context, *, command: str):
+        """Disables a command, or every command of a category, in this server."""
+        for cmd in self.get_commands(command):
+            await self.bot.access.disable(ctx.guild.id, cmd)
+        await ctx.send(f"Disabled `{command}`.")
+
+    @core.command(
+        examples=("osu profile",),
+        params={"command": "The command or category to enable again."},
+        returns="Confirmation that the command was enabled.",
+    )
+    @commands.guild_only()
+    @checks.has_permissions(manage_guild=True)
+    async def enable(self, ctx: core.Context, *, command: str):
+        """Enables a disabled command, or every command of a category, in this server."""
+        for cmd in self.get_commands(command):
+            await self.bot.access.enable(ctx.guild.id, cmd)
+        await ctx.send(f"Enabled `{command}`.")
+
+    @core.command(returns="The commands disabled in this server.")
+    @commands.guild_only()
+    async def disabled(self, ctx: core.Context):
+        """Shows the commands disabled in this server."""
+        disabled = sorted(self.bot.access.disabled(ctx.guild.id))
+        description = "\n".join(f"`{name}`" for name in disabled) or "Nothing is disabled."
+        await ctx.send(embed=self.bot.embed(title="Disabled commands", description=description))
+
+    def get_commands(self, name: str) -> List[commands.Command]:
+        command = self.bot.get_command(name)
+        if command is not None:
+            return [command]
+        cog = discord.utils.find(lambda c: c.qualified_name.lower() == name.lower(), self.bot.cogs.values())
+        if cog is None or not cog.get_commands():
+            raise commands.BadArgument(f"I couldn't find a command or category named `{name}`.")
+        return cog.get_commands()
+
+
+def setup(bot: core.Bot):
+    bot.add_cog(Settings(bot))
@@ -14,14 +14,17 @@ from traceback import format_exc
 import click
 from asyncpg import Pool, create_pool
 
-from config import postgres_uri, token
+from config import cluster as cluster_config
+from config import database, postgres_uri, token
 from core import Bot
+from core.cluster import ClusterLauncher
+from core.ipc import IPCClient
 from utils import db
 
 log = logging.getLogger(__name__)
 
 
-def run():
+def run(*, cluster_id=None, shard_ids=None, shard_count=None, ipc_port=None):
     os.environ["JISHAKU_NO_UNDERSCORE"] = "True"
     os.environ["JISHAKU_NO_DM_TRACEBACK"] = "True"
     os.environ["JISHAKU_HIDE"] = "True"
@@ -29,8 +32,10 @@ def run():
 
     loop = asyncio.get_event_loop()
 
-    bot = Bot(loop=loop)
-    bot.pool = loop.run_until_complete(db.create_pool(bot=bot, dsn=postgres_uri, loop=bot.loop))
+    bot = Bot(loop=loop, shard_ids=shard_ids, shard_count=shard_count, cluster_id=cluster_id)
+    if cluster_id is not None:
+        bot.ipc = IPCClient(bot, cluster_id=cluster_id, port=ipc_port)
+    bot.pool = loop.run_until_complete(db.create_pool(bot=bot, dsn=postgres_uri, loop=bot.loop, **database._asdict()))
 
     bot.run(token)
 
@@ -43,6 +48,29 @@ def main(ctx):
         run()
 
 
+@main.command(short_help="runs the bot as several processes", options_metavar="[options]")
+@click.option("-c", "--clusters", help="how many processes to run, defaults to the cpu count", type=int)
+@click.option("-s", "--shards", help="total shard count, defaults to what discord recommends", type=int)
+def cluster(clusters: int, shards: int):
+    clusters = clusters or cluster_config.clusters or os.cpu_count() or 1
+    launcher = ClusterLauncher(token, clusters=clusters, shard_count=shards, ipc_port=cluster_config.ipc_port)
+    try:
+        get_event_loop().run_until_complete(launcher.start())
+    except KeyboardInterrupt:
+        launcher.close()
+
+
+@main.command(hidden=True, options_metavar="[options]")
+@click.option("--cluster-id", type=int, required=True)
+@click.option("--shard-ids", required=True)
+@click.option("--shard-count", type=int, required=True)
+@click.option("--ipc-port", type=int, required=True)
+def worker(cluster_id: int, shard_ids: str, shard_count: int, ipc_port: int):
+    """Runs a single cluster, started by the cluster command."""
+    shard_ids = [int(i) for i in shard_ids.split(",")]
+    run(cluster_id=cluster_id, shard_ids=shard_ids, shard_count=shard_count, ipc_port=ipc_port)
+
+
 @main.command(short_help="initialises the databases for the bot", options_metavar="[options]")
 @click.option("-s", "--show", help="show the output", is_flag=True)
 @click.option("--start_bot", help="run bot after", is_flag=True)
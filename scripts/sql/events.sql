@@ -7,4 +7,9 @@ CREATE TABLE IF NOT EXISTS events.timers (
     created TIMESTAMPTZ NOT NULL,
     expires TIMESTAMPTZ NOT NULL,
     data JSONB NOT NULL
-)
\ No newline at end of file
+);
+
+-- the guild picks the cluster delivering the timer, the lease keeps the others off it while it does
+ALTER TABLE events.timers ADD COLUMN IF NOT EXISTS guild BIGINT;
+ALTER TABLE events.timers ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMPTZ;
+ALTER TABLE events.timers ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
\ No newline at end of file
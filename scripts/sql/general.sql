@@ -3,6 +3,37 @@ CREATE TABLE IF NOT EXISTS public.guilds (
 );
 
 CREATE TABLE IF NOT EXISTS public.prefixes (
-    id BIGINT PRIMARY KEY REFERENCES guilds (id) ON DELETE CASCADE,
-    prefix VARCHAR(25)
+    id BIGINT REFERENCES guilds (id) ON DELETE CASCADE,
+    prefix VARCHAR(25),
+    PRIMARY KEY (id, prefix)
+);
+
+-- older databases have the primary key on id alone, which only allows one prefix per guild
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM information_schema.table_constraints c
+        JOIN information_schema.key_column_usage k USING (constraint_schema, constraint_name)
+        WHERE c.table_schema = 'public'
+            AND c.table_name = 'prefixes'
+            AND c.constraint_type = 'PRIMARY KEY'
+            AND k.column_name = 'prefix'
+    ) THEN
+        ALTER TABLE public.prefixes DROP CONSTRAINT IF EXISTS prefixes_pkey;
+        DELETE FROM public.prefixes WHERE prefix IS NULL;
+        ALTER TABLE public.prefixes ADD PRIMARY KEY (id, prefix);
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS public.blocklist (
+    snowflake BIGINT PRIMARY KEY,
+    guild BOOLEAN NOT NULL DEFAULT FALSE,
+    reason TEXT
+);
+
+CREATE TABLE IF NOT EXISTS public.disabled_commands (
+    id BIGINT REFERENCES guilds (id) ON DELETE CASCADE,
+    command TEXT,
+    PRIMARY KEY (id, command)
 );
\ No newline at end of file
@@ -0,0 +1,79 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("asyncpg")
+if not os.path.exists("config.yml"):
+    pytest.skip("core needs a config.yml", allow_module_level=True)
+
+from core.context import LazyConnection  # noqa: E402
+
+
+class FakeTransaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def start(self):
+        self.connection.events.append("begin")
+
+    async def commit(self):
+        self.connection.events.append("commit")
+
+    async def rollback(self):
+        self.connection.events.append("rollback")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.events = []
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    async def fetchval(self, query, *args, column=0, timeout=None):
+        return 1
+
+
+class FakePool:
+    def __init__(self):
+        self.connection = FakeConnection()
+        self.in_use = 0
+
+    async def acquire(self):
+        self.in_use += 1
+        return self.connection
+
+    async def release(self, connection):
+        self.in_use -= 1
+
+
+def test_released_after_block():
+    async def run():
+        pool = FakePool()
+        db = LazyConnection(pool, transaction=True)
+        async with db:
+            assert await db.fetchval("SELECT 1") == 1
+            assert pool.in_use == 1
+        assert pool.in_use == 0 and not db.acquired
+        assert pool.connection.events == ["begin", "commit"]
+
+        # Bot.invoke releases it again, which does nothing
+        await db.release()
+        assert pool.in_use == 0
+
+    asyncio.run(run())
+
+
+def test_released_on_error():
+    async def run():
+        pool = FakePool()
+        db = LazyConnection(pool, transaction=True)
+        with pytest.raises(RuntimeError):
+            async with db:
+                await db.fetchval("SELECT 1")
+                raise RuntimeError
+        assert pool.in_use == 0 and not db.acquired
+        assert pool.connection.events == ["begin", "rollback"]
+
+    asyncio.run(run())
@@ -0,0 +1,96 @@
+import asyncio
+import contextlib
+
+import pytest
+
+pytest.importorskip("asyncpg")
+
+from utils.db import PoolLimiter, create_pool, fingerprint, redact  # noqa: E402
+
+
+class FakeConnection:
+    def __init__(self):
+        self.calls = []
+
+    async def call(self, name, *args, timeout=None):
+        self.calls.append((name, args))
+        return f"{name}{args}"
+
+
+def make_pool(connection):
+    # never awaited, so it doesn't connect
+    pool = create_pool(None, "postgresql://localhost/test", min_size=1, max_size=1)
+
+    @contextlib.asynccontextmanager
+    async def acquire(timeout=None):
+        yield connection
+
+    pool.acquire = acquire
+    return pool
+
+
+def test_call():
+    async def run():
+        connection = FakeConnection()
+        pool = make_pool(connection)
+        assert await pool.call("timers.claim", 1) == "timers.claim(1,)"
+
+        other = FakeConnection()
+        await pool.call("timers.claim", 2, connection=other)
+        assert connection.calls == [("timers.claim", (1,))]
+        assert other.calls == [("timers.claim", (2,))]
+
+    asyncio.run(run())
+
+
+def test_call_cached():
+    async def run():
+        connection = FakeConnection()
+        pool = make_pool(connection)
+        tags = ("games:osu:1",)
+        first = await pool.call_cached("games.lookup", "osu", 1, ttl=60, tags=tags)
+        assert await pool.call_cached("games.lookup", "osu", 1, ttl=60, tags=tags) == first
+        assert len(connection.calls) == 1
+
+        pool.invalidate(*tags)
+        await pool.call_cached("games.lookup", "osu", 1, ttl=60, tags=tags)
+        assert len(connection.calls) == 2
+
+    asyncio.run(run())
+
+
+def test_limiter_grows_on_wait():
+    async def run():
+        limiter = PoolLimiter(min_size=2, max_size=12, target_wait=0.05)
+        assert limiter.limit == 10
+        for _ in range(12):
+            await asyncio.wait_for(limiter.acquire(), timeout=1)
+        assert limiter.limit == 12
+
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        limiter.release()
+        await asyncio.wait_for(waiter, timeout=1)
+
+        for _ in range(12):
+            limiter.release()
+        limiter.adjust()
+        limiter.adjust()
+        assert limiter.limit == 11
+
+    asyncio.run(run())
+
+
+def test_fingerprint():
+    query = """
+        SELECT * FROM users.games
+        WHERE snowflake = $1 AND game = 'osu' AND id IN (1, 2, 3) AND score > 4.5 LIMIT $12
+        """
+    assert fingerprint(query) == (
+        "SELECT * FROM users.games WHERE snowflake = $1 AND game = ? AND id IN (?) AND score > ? LIMIT $12"
+    )
+
+
+def test_redact():
+    assert redact((1, "secret", [1, 2], None)) == ["int", "str[6]", "list[2]", "NoneType"]
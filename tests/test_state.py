@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+if not os.path.exists("config.yml"):
+    pytest.skip("core needs a config.yml", allow_module_level=True)
+
+from core.state import ParserTable, cache_events  # noqa: E402
+
+EVENTS = ("PRESENCE_UPDATE", "TYPING_START", "GUILD_MEMBER_ADD", "MESSAGE_UPDATE", "MESSAGE_REACTION_ADD")
+
+
+def make_table(**cached):
+    counted = []
+    table = ParserTable({event: event for event in EVENTS}, counted.append, cache_events(**cached))
+    return table, counted
+
+
+def test_parses_everything_until_listen():
+    table, counted = make_table(messages=False, members=False)
+    assert [table[event] for event in EVENTS] == list(EVENTS)
+    assert counted == list(EVENTS)
+
+
+def test_listen_skips_unused():
+    table, counted = make_table(messages=False, members=False)
+    table.listen({"member_update", "raw_reaction_add", "command_completion"})
+    parsed = {event for event in EVENTS if table[event] == event}
+    # member joins keep guild.member_count right, so they are always parsed
+    assert parsed == {"PRESENCE_UPDATE", "GUILD_MEMBER_ADD", "MESSAGE_REACTION_ADD"}
+    assert counted == list(EVENTS)
+
+
+def test_cached_events_always_parsed():
+    table, _ = make_table(messages=True, members=False)
+    table.listen(())
+    assert table["MESSAGE_UPDATE"] == "MESSAGE_UPDATE"
+    assert table["MESSAGE_REACTION_ADD"] == "MESSAGE_REACTION_ADD"
+    assert table["TYPING_START"] != "TYPING_START"
@@ -1,8 +1,19 @@
 from discord.ext import commands
 
-__all__ = ("can_run",)
+__all__ = ("can_run", "members_chunked")
 
 
 can_run = commands.bot_has_permissions
 
 has_permissions = commands.has_permissions
+
+
+def members_chunked():
+    """Makes sure every member of the guild is cached before the command runs."""
+
+    async def predicate(ctx):
+        if ctx.guild is not None:
+            await ctx.bot.members.chunk(ctx.guild)
+        return True
+
+    return commands.check(predicate)
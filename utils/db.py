@@ -1,14 +1,469 @@
-from asyncpg import Connection, Pool, Record
+import asyncio
+import functools
+import logging
+import re
+import sys
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+from urllib.parse import urlsplit
 
-__all__ = ("CustomPool", "create_pool")
+import asyncpg
+from asyncpg import Connection, InterfaceError, Pool, PostgresError, Record
+from asyncpg.prepared_stmt import PreparedStatement
+
+from .statements import STATEMENTS, Statement
+
+__all__ = ("QueryStats", "QueryCache", "TrackedConnection", "Replica", "CustomPool", "create_pool")
+
+log = logging.getLogger(__name__)
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+# not the digits of $n parameters
+_NUMBERS = re.compile(r"(?<!\$)\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(query: str) -> str:
+    """The query with literals replaced by ``?`` and whitespace collapsed, ``$n`` parameters are kept."""
+    query = _STRINGS.sub("?", query)
+    query = _NUMBERS.sub("?", query)
+    query = _LISTS.sub("(?)", query)
+    return _SPACES.sub(" ", query).strip()
+
+
+def redact(args: Sequence[Any]) -> List[str]:
+    # only the shape of the arguments, their values may be user data
+    return [type(arg).__name__ if not hasattr(arg, "__len__") else f"{type(arg).__name__}[{len(arg)}]" for arg in args]
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Query:
+    __slots__ = ("calls", "errors", "total", "rows", "durations")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.rows = 0
+        self.durations: Deque[float] = deque(maxlen=1000)
+
+
+class QueryStats:
+    """Execution times per query fingerprint, the time spent waiting for a connection and the slow queries.
+
+    Percentiles are over the last 1000 calls of a query.
+    """
+
+    def __init__(self, *, slow_query_ms: float = 250.0) -> None:
+        self.slow_query_ms = slow_query_ms
+        self.queries: Dict[str, _Query] = {}
+        self.acquires: Deque[float] = deque(maxlen=1000)
+        self.slow: Deque[Dict[str, Any]] = deque(maxlen=100)
+
+    def record(
+        self,
+        query: str,
+        args: Sequence[Any],
+        duration: float,
+        rows: Optional[int],
+        failed: bool,
+        *,
+        name: Optional[str] = None,
+    ) -> None:
+        # named statements are tracked by name
+        key = name or fingerprint(query)
+        stats = self.queries.get(key)
+        if stats is None:
+            stats = self.queries[key] = _Query()
+        stats.calls += 1
+        stats.errors += failed
+        stats.total += duration
+        stats.rows += rows or 0
+        stats.durations.append(duration)
+
+        if duration * 1000 >= self.slow_query_ms:
+            self.slow.append({"query": key, "args": redact(args), "ms": round(duration * 1000, 2), "at": time.time()})
+            log.warning(f"Slow query ({duration * 1000:.2f}ms): {key[:200]}")
+
+    def query_stats(self) -> List[Dict[str, Any]]:
+        """Every query fingerprint, the ones taking the most time in total first."""
+        result = []
+        for key, stats in self.queries.items():
+            ordered = sorted(stats.durations)
+            result.append(
+                {
+                    "query": key,
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "rows": stats.rows,
+                    "total": round(stats.total * 1000, 2),
+                    "p50": round(_percentile(ordered, 0.5) * 1000, 2),
+                    "p95": round(_percentile(ordered, 0.95) * 1000, 2),
+                    "p99": round(_percentile(ordered, 0.99) * 1000, 2),
+                }
+            )
+        return sorted(result, key=lambda query: query["total"], reverse=True)
+
+    def acquire_stats(self) -> Dict[str, float]:
+        ordered = sorted(self.acquires)
+        if not ordered:
+            return {"count": 0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "count": len(ordered),
+            "p50": round(_percentile(ordered, 0.5) * 1000, 2),
+            "p95": round(_percentile(ordered, 0.95) * 1000, 2),
+            "max": round(ordered[-1] * 1000, 2),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"queries": self.query_stats(), "acquire": self.acquire_stats(), "slow": list(self.slow)}
+
+
+def _estimate(value: Any) -> int:
+    # records and lists of records, close enough for a memory budget
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(_estimate(item) for item in value)
+    if isinstance(value, Record):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+class QueryCache:
+    """Query results by ``(method, query, args)``, each with its own TTL.
+
+    The least recently used results are evicted once the cache goes over ``max_bytes``. Entries
+    can be given tags, invalidating a tag drops every entry that has it.
+    """
+
+    def __init__(self, *, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, int, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._pop(key)
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def set(self, key: Hashable, value: Any, *, ttl: float, tags: Iterable[str] = ()) -> None:
+        if key in self._entries:
+            self._pop(key)
+        tags = tuple(tags)
+        size = _estimate(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value, size, tags)
+        self.size += size
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while self.size > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+            self.evicted += 1
+
+    def _pop(self, key: Hashable) -> None:
+        _, _, size, tags = self._entries.pop(key)
+        self.size -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, *tags: str) -> int:
+        """Drops every entry with one of the tags, returns how many were dropped."""
+        dropped = 0
+        for tag in tags:
+            for key in tuple(self._tags.get(tag, ())):
+                self._pop(key)
+                dropped += 1
+        return dropped
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_size": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+        }
+
+
+def _status_rows(status: str) -> Optional[int]:
+    # "INSERT 0 3", "UPDATE 2", "DELETE 0"...
+    count = status.rsplit(" ", 1)[-1]
+    return int(count) if count.isdigit() else None
+
+
+class TrackedConnection(Connection):
+    """Reports the time and rows of every query to the :class:`QueryStats` of its pool."""
+
+    _query_stats: Optional[QueryStats] = None
+    _prepared: Dict[str, PreparedStatement] = {}
+
+    async def _tracked(self, query: str, args: Sequence[Any], coro, rows, *, name: Optional[str] = None):
+        if self._query_stats is None:
+            return await coro
+        start = time.perf_counter()
+        try:
+            result = await coro
+        except Exception:
+            self._query_stats.record(query, args, time.perf_counter() - start, None, True, name=name)
+            raise
+        self._query_stats.record(query, args, time.perf_counter() - start, rows(result), False, name=name)
+        return result
+
+    async def prepare_statements(self, statements: Dict[str, Statement]) -> None:
+        """Prepares the named statements, a statement that doesn't parse or plan fails the connection."""
+        prepared = {}
+        for name, statement in statements.items():
+            try:
+                prepared[name] = await self.prepare(statement.query)
+            except PostgresError:
+                log.error(f"Statement {name} could not be prepared.")
+                raise
+        self._prepared = prepared
+
+    async def call(self, name: str, *args, timeout: float = None):
+        """Runs a statement of :data:`utils.statements.STATEMENTS` by name."""
+        statement = STATEMENTS[name]
+        prepared = self._prepared.get(name)
+        if prepared is None:
+            # not prepared on this connection (pgbouncer mode), it runs like any other query
+            return await getattr(self, statement.kind)(statement.query, *args, timeout=timeout)
+
+        if statement.kind == "execute":
+            coro = self._execute_prepared(prepared, args, timeout)
+        else:
+            coro = getattr(prepared, statement.kind)(*args, timeout=timeout)
+        rows = {"execute": _status_rows, "fetch": len}.get(statement.kind, lambda value: int(value is not None))
+        return await self._tracked(statement.query, args, coro, rows, name=name)
+
+    @staticmethod
+    async def _execute_prepared(prepared: PreparedStatement, args: Sequence[Any], timeout: Optional[float]) -> str:
+        await prepared.fetch(*args, timeout=timeout)
+        return prepared.get_statusmsg()
+
+    async def execute(self, query: str, *args, timeout: float = None) -> str:
+        coro = super().execute(query, *args, timeout=timeout)
+        return await self._tracked(query, args, coro, _status_rows)
+
+    async def executemany(self, command: str, args, *, timeout: float = None):
+        coro = super().executemany(command, args, timeout=timeout)
+        return await self._tracked(command, (), coro, lambda _: None)
+
+    async def fetch(self, query, *args, timeout=None, record_class=None) -> list:
+        coro = super().fetch(query, *args, timeout=timeout, record_class=record_class)
+        return await self._tracked(query, args, coro, len)
+
+    async def fetchval(self, query, *args, column=0, timeout=None):
+        coro = super().fetchval(query, *args, column=column, timeout=timeout)
+        return await self._tracked(query, args, coro, lambda value: int(value is not None))
+
+    async def fetchrow(self, query, *args, timeout=None, record_class=None):
+        coro = super().fetchrow(query, *args, timeout=timeout, record_class=record_class)
+        return await self._tracked(query, args, coro, lambda row: int(row is not None))
+
+    async def copy_records_to_table(self, table_name, *, records, columns=None, schema_name=None, timeout=None):
+        coro = super().copy_records_to_table(
+            table_name, records=records, columns=columns, schema_name=schema_name, timeout=timeout
+        )
+        query = f"COPY {schema_name + '.' if schema_name else ''}{table_name}"
+        return await self._tracked(query, (), coro, _status_rows)
+
+
+class PoolLimiter:
+    """Caps how many connections can be checked out at once, between ``min_size`` and ``max_size``.
+
+    An acquire that would have to wait raises the cap right away, up to ``max_size``. :meth:`adjust`
+    is called every few seconds and lowers it again when less than half of it was used. The pool
+    opens connections up to the cap as needed, and closes the ones left idle after its inactive lifetime.
+    """
+
+    def __init__(self, *, min_size: int, max_size: int, target_wait: float) -> None:
+        self.min_size = min_size
+        self.max_size = max_size
+        # only used to warn about a saturated pool
+        self.target_wait = target_wait
+        # the old fixed pool size, so a burst right after startup doesn't have to grow it first
+        self.limit = min(max_size, max(min_size, 10))
+
+        self.in_use = 0
+        self.peak = 0
+        self.saturated = 0
+        self._waits: List[float] = []
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._warned = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return sum(not waiter.done() for waiter in self._waiters)
+
+    async def acquire(self) -> None:
+        if self.in_use >= self.limit and self.limit < self.max_size:
+            self.limit += 1
+            log.debug(f"Raised the pool limit to {self.limit}.")
+            self._wake()
+
+        if self.in_use < self.limit and not self._waiters:
+            self.in_use += 1
+            self.peak = max(self.peak, self.in_use)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # the slot is counted for us before the waiter is woken
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        self.in_use -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_use < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_use += 1
+                self.peak = max(self.peak, self.in_use)
+                waiter.set_result(None)
+
+    def record(self, wait: float) -> None:
+        self._waits.append(wait)
+
+    def adjust(self) -> None:
+        waits = sorted(self._waits)
+        slow = bool(waits) and _percentile(waits, 0.95) > self.target_wait
+
+        # acquires raise the limit themselves, anything still waiting here is waiting on max_size
+        if self.limit >= self.max_size and (slow or self.waiting > 0):
+            self.saturated += 1
+            if time.monotonic() - self._warned > 60:
+                self._warned = time.monotonic()
+                log.warning(
+                    f"Pool saturated at {self.max_size} connections, "
+                    f"p95 acquire wait {_percentile(waits, 0.95) * 1000 if waits else 0:.2f}ms, "
+                    f"{self.waiting} waiting."
+                )
+        elif self.peak < self.limit / 2 and self.limit > self.min_size:
+            self.limit -= 1
+            log.debug(f"Lowered the pool limit to {self.limit}.")
+
+        self._waits = []
+        self.peak = self.in_use
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "min": self.min_size,
+            "max": self.max_size,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "utilisation": round(self.in_use / self.limit, 2),
+            "saturated": self.saturated,
+        }
+
+
+# seconds the replica is behind, a replica that replayed everything it received is not behind at all
+# however long ago the last write was. A server that isn't replicating reports 0.
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+
+
+class Replica:
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+        self.pool: Optional[Pool] = None
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.reads = 0
+        self.error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        # no credentials
+        url = urlsplit(self.dsn)
+        return f"{url.hostname}:{url.port or 5432}{url.path}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "healthy": self.healthy, "lag": self.lag, "reads": self.reads, "error": self.error}
 
 
 class CustomPool(Pool):
-    def __init__(self, bot, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def __init__(
+        self,
+        bot,
+        *args,
+        slow_query_ms: float = 250.0,
+        cache_mb: float = 4.0,
+        target_wait_ms: float = 50.0,
+        replicas: Sequence[str] = (),
+        max_lag: float = 5.0,
+        statements: Optional[Dict[str, Statement]] = None,
+        pgbouncer: bool = False,
+        init=None,
+        **kwargs,
+    ):
+        # behind PgBouncer in transaction mode each query can land on another server connection, so
+        # nothing may live in the session: no named or cached prepared statements, no reset query
+        self.pgbouncer = pgbouncer
+        if pgbouncer:
+            kwargs["statement_cache_size"] = 0
+            statements = {}
+        self.replicas = [Replica(dsn) for dsn in replicas]
+        self.max_lag = max_lag
+        self._next_replica = 0
+        # replica pools get the same connection options, with their own size
+        self._replica_options = {
+            key: value for key, value in kwargs.items() if key not in ("min_size", "max_size", "max_queries")
+        }
+        self.limiter = PoolLimiter(
+            min_size=kwargs["min_size"], max_size=kwargs["max_size"], target_wait=target_wait_ms / 1000
+        )
+        self.statements = STATEMENTS if statements is None else statements
+        self.stats = QueryStats(slow_query_ms=slow_query_ms)
+        self.cache = QueryCache(max_bytes=int(cache_mb * 1024 ** 2))
+        self._user_init = init
+        super().__init__(*args, init=self._init, **kwargs)
         self.bot = bot
 
-        self.cache = {}
         self.calls = {
             "EXECUTE": 0,
             "EXECUTEMANY": 0,
@@ -17,6 +472,114 @@ class CustomPool(Pool):
             "FETCHROW": 0,
         }
 
+    async def _async__init__(self):
+        pool = await super()._async__init__()
+        for replica in self.replicas:
+            await self._check_replica(replica)
+        return pool
+
+    async def _check_replica(self, replica: Replica) -> None:
+        try:
+            if replica.pool is None:
+                replica.pool = await asyncpg.create_pool(
+                    replica.dsn, min_size=1, max_size=self.limiter.max_size, init=self._init, **self._replica_options
+                )
+            replica.lag = float(await replica.pool.fetchval(LAG_QUERY, timeout=5))
+        except (OSError, asyncio.TimeoutError, InterfaceError, PostgresError) as err:
+            if replica.healthy or replica.lag is None:
+                log.warning(f"Replica {replica.name} is unavailable: {err}")
+            replica.healthy = False
+            replica.error = f"{type(err).__name__}: {err}"
+            return
+
+        if not replica.healthy:
+            log.info(f"Replica {replica.name} is available, {replica.lag:.2f}s behind.")
+        replica.healthy = True
+        replica.error = None
+
+    async def check_replicas(self) -> None:
+        """Checks every replica is up and how far behind it is, run every few seconds by the supervisor."""
+        for replica in self.replicas:
+            await self._check_replica(replica)
+
+    def _replica(self) -> Optional[Replica]:
+        usable = [replica for replica in self.replicas if replica.healthy and replica.lag <= self.max_lag]
+        if not usable:
+            return None
+        self._next_replica += 1
+        return usable[self._next_replica % len(usable)]
+
+    async def _read(self, method: str, query: str, args: tuple, primary: bool, **kwargs):
+        if not primary and (replica := self._replica()) is not None:
+            try:
+                async with replica.pool.acquire() as con:
+                    result = await getattr(con, method)(query, *args, **kwargs)
+            except (OSError, InterfaceError) as err:
+                # the connection went away, not the query failing, the primary still has the answer
+                replica.healthy = False
+                replica.error = f"{type(err).__name__}: {err}"
+                log.warning(f"Replica {replica.name} failed a read, using the primary: {err}")
+            else:
+                replica.reads += 1
+                return result
+
+        async with self.acquire() as con:
+            return await getattr(con, method)(query, *args, **kwargs)
+
+    async def close(self):
+        await super().close()
+        for replica in self.replicas:
+            if replica.pool is not None:
+                await replica.pool.close()
+
+    async def _init(self, connection: Connection) -> None:
+        if isinstance(connection, TrackedConnection):
+            connection._query_stats = self.stats
+            await connection.prepare_statements(self.statements)
+        if self.pgbouncer:
+            # the session state it resets is never set up, and it would only reach a random server connection
+            connection._reset_query = ""
+        if self._user_init is not None:
+            await self._user_init(connection)
+
+    async def _acquire(self, timeout):
+        start = time.perf_counter()
+        try:
+            if timeout is None:
+                await self.limiter.acquire()
+            else:
+                await asyncio.wait_for(self.limiter.acquire(), timeout=timeout)
+            try:
+                return await super()._acquire(timeout)
+            except BaseException:
+                self.limiter.release()
+                raise
+        finally:
+            wait = time.perf_counter() - start
+            self.stats.acquires.append(wait)
+            self.limiter.record(wait)
+
+    async def release(self, connection, *, timeout=None):
+        try:
+            await super().release(connection, timeout=timeout)
+        finally:
+            self.limiter.release()
+
+    async def adjust(self) -> None:
+        """Resizes the limiter, run every few seconds by the supervisor."""
+        self.limiter.adjust()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        # asyncpg 0.24 has no get_size, holders without a connection haven't connected yet or were idle too long
+        connections = sum(holder._con is not None for holder in self._holders)
+        return {
+            **self.limiter.stats(),
+            "pgbouncer": self.pgbouncer,
+            "connections": connections,
+            "acquire": self.stats.acquire_stats(),
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
+
     async def execute(self, query: str, *args, timeout: float = None) -> str:
         self.calls["EXECUTE"] += 1
         async with self.acquire() as con:
@@ -27,71 +590,142 @@ class CustomPool(Pool):
         async with self.acquire() as con:
             return await con.executemany(command, args, timeout=timeout)
 
-    async def fetch(self, query, *args, timeout=None) -> list:
+    # reads go to a replica when there is a usable one, unless pinned to the primary with primary=True.
+    # Anything on an acquired connection, so every transaction, stays on the primary.
+
+    async def fetch(self, query, *args, timeout=None, primary: bool = False) -> list:
         self.calls["FETCH"] += 1
-        async with self.acquire() as con:
-            return await con.fetch(query, *args, timeout=timeout)
+        return await self._read("fetch", query, args, primary, timeout=timeout)
 
-    async def fetchval(self, query, *args, column=0, timeout=None):
+    async def fetchval(self, query, *args, column=0, timeout=None, primary: bool = False):
         self.calls["FETCHVAL"] += 1
-        async with self.acquire() as con:
-            return await con.fetchval(query, *args, column=column, timeout=timeout)
+        return await self._read("fetchval", query, args, primary, column=column, timeout=timeout)
 
-    async def fetchrow(self, query, *args, timeout=None):
+    async def fetchrow(self, query, *args, timeout=None, primary: bool = False):
         self.calls["FETCHROW"] += 1
+        return await self._read("fetchrow", query, args, primary, timeout=timeout)
+
+    async def _cached(
+        self, method: str, query: str, args: tuple, ttl: float, tags: Iterable[str], connection, **kwargs
+    ):
+        key = (method, query, args)
+        hit, value = self.cache.get(key)
+        if hit:
+            return value
+        value = await getattr(connection or self, method)(query, *args, **kwargs)
+        self.cache.set(key, value, ttl=ttl, tags=tags)
+        return value
+
+    async def fetch_cached(self, query, *args, ttl: float, tags: Iterable[str] = (), connection=None) -> list:
+        """:meth:`fetch`, reusing the result for ``ttl`` seconds or until one of ``tags`` is invalidated.
+
+        A miss runs on ``connection`` if given, so it can share the connection of an invocation.
+        """
+        return await self._cached("fetch", query, args, ttl, tags, connection)
+
+    async def fetchval_cached(self, query, *args, ttl: float, tags: Iterable[str] = (), column=0, connection=None):
+        return await self._cached("fetchval", query, args, ttl, tags, connection, column=column)
+
+    async def fetchrow_cached(self, query, *args, ttl: float, tags: Iterable[str] = (), connection=None):
+        return await self._cached("fetchrow", query, args, ttl, tags, connection)
+
+    async def call(self, name: str, *args, timeout: float = None, connection=None):
+        """Runs a named statement, see :meth:`TrackedConnection.call`."""
+        if connection is not None:
+            return await connection.call(name, *args, timeout=timeout)
         async with self.acquire() as con:
-            return await con.fetchrow(query, *args, timeout=timeout)
-
-    async def register_user(self, game: str, snowflake: int, _id: str):
-        query = """
-            INSERT INTO
-                users.games
-            VALUES
-                ($1, $2, $3)
-            ON CONFLICT (game, snowflake)
-                DO UPDATE
-                    SET
-                        id = $3
-            """
-        await self.execute(query, game, snowflake, _id)
-
-    async def command_insert(self, data: str):
-        query = """
-            INSERT INTO
-                commands (guild, channel, author, used, prefix, command, failed)
-            SELECT x.guild, x.channel, x.author, x.used, x.prefix, x.command, x.failed
-                   FROM JSONB_TO_RECORDSET($1::jsonb) AS
-                   x(
-                        guild BIGINT,
-                        channel BIGINT,
-                        author BIGINT,
-                        used TIMESTAMP,
-                        prefix TEXT,
-                        command TEXT,
-                        failed BOOLEAN
+            return await con.call(name, *args, timeout=timeout)
+
+    async def call_cached(self, name: str, *args, ttl: float, tags: Iterable[str] = (), connection=None):
+        return await self._cached("call", name, args, ttl, tags, connection)
+
+    def invalidate(self, *tags: str) -> int:
+        return self.cache.invalidate(*tags)
+
+    async def register_user(self, game: str, snowflake: int, _id: str, *, connection=None):
+        await (connection or self).call("games.register", game, snowflake, _id)
+        self.invalidate(f"games:{game}:{snowflake}")
+
+    async def copy_records(
+        self, table: str, records: List[tuple], *, columns: Sequence[str], schema: str = "public", connection=None
+    ) -> str:
+        """Appends records to a table with a binary COPY, for tables that only get inserts."""
+        if connection is not None:
+            return await connection.copy_records_to_table(table, records=records, columns=columns, schema_name=schema)
+        async with self.acquire() as con:
+            return await con.copy_records_to_table(table, records=records, columns=columns, schema_name=schema)
+
+    async def copy_merge(
+        self,
+        table: str,
+        records: List[tuple],
+        *,
+        columns: Sequence[str],
+        merge: str,
+        schema: str = "public",
+        connection=None,
+    ) -> str:
+        """COPYs the records into a temporary staging table shaped like the table, then runs ``merge``.
+
+        ``merge`` is one statement moving the rows over, ``{staging}`` in it is the name of the staging
+        table. It all runs in one transaction, the staging table is dropped on commit.
+        """
+        staging = f"_staging_{table}"
+
+        async def run(con) -> str:
+            async with con.transaction():
+                await con.execute(
+                    f"CREATE TEMPORARY TABLE {staging} (LIKE {schema}.{table} INCLUDING DEFAULTS) ON COMMIT DROP"
                 )
-            """
-        await self.execute(query, data)
+                await con.copy_records_to_table(staging, records=records, columns=columns)
+                return await con.execute(merge.format(staging=staging))
+
+        if connection is not None:
+            return await run(connection)
+        async with self.acquire() as con:
+            return await run(con)
+
+    async def command_insert(self, records: List[tuple], *, connection=None) -> str:
+        """Records are ``(guild, channel, author, used, prefix, command, failed)``."""
+        return await self.copy_records(
+            "commands",
+            records,
+            columns=("guild", "channel", "author", "used", "prefix", "command", "failed"),
+            schema="stats",
+            connection=connection,
+        )
 
 
 def create_pool(
     bot,
     dsn=None,
     *,
-    min_size=10,
-    max_size=10,
+    min_size=2,
+    max_size=20,
     max_queries=50000,
     max_inactive_connection_lifetime=300.0,
     setup=None,
     init=None,
     loop=None,
-    connection_class=Connection,
+    connection_class=TrackedConnection,
     record_class=Record,
+    slow_query_ms=250.0,
+    cache_mb=4.0,
+    target_wait_ms=50.0,
+    replicas=(),
+    max_lag=5.0,
+    pgbouncer=False,
     **connect_kwargs,
 ) -> CustomPool:
     return CustomPool(
         bot,
         dsn,
+        slow_query_ms=slow_query_ms,
+        cache_mb=cache_mb,
+        target_wait_ms=target_wait_ms,
+        replicas=replicas,
+        max_lag=max_lag,
+        pgbouncer=pgbouncer,
         connection_class=connection_class,
         record_class=record_class,
         min_size=min_size,
@@ -0,0 +1,79 @@
+from typing import Dict, NamedTuple
+
+__all__ = ("Statement", "STATEMENTS")
+
+KINDS = ("execute", "fetch", "fetchval", "fetchrow")
+
+
+class Statement(NamedTuple):
+    query: str
+    # the connection method it stands in for, an execute returns the status like Connection.execute
+    kind: str
+
+
+# Every new connection of the pool prepares these, see TrackedConnection.prepare_statements.
+# Call them by name with pool.call or connection.call.
+STATEMENTS: Dict[str, Statement] = {
+    # only the timers of guilds on these shards ($2 is the shard count), timers without a guild go to shard 0
+    "timers.next": Statement(
+        """
+        SELECT *
+        FROM
+            events.timers
+        WHERE
+            expires < (CURRENT_DATE + $1::interval)
+            AND (claimed_until IS NULL OR claimed_until < NOW())
+            AND COALESCE(guild >> 22, 0) % $2 = ANY($3::INT[])
+        ORDER BY
+            expires
+        LIMIT
+            1
+        """,
+        "fetchrow",
+    ),
+    # a lease, the timer is only deleted once it was delivered and is retried after the lease runs out
+    "timers.claim": Statement(
+        """
+        UPDATE
+            events.timers
+        SET
+            claimed_until = NOW() + $2::interval, attempts = attempts + 1
+        WHERE
+            id = $1 AND (claimed_until IS NULL OR claimed_until < NOW())
+        RETURNING
+            attempts
+        """,
+        "fetchval",
+    ),
+    "timers.complete": Statement("DELETE FROM events.timers WHERE id = $1", "execute"),
+    "interactions.update": Statement(
+        """
+        WITH total_update AS (
+            INSERT INTO users.totals (method, snowflake) VALUES ($1, $3)
+            ON CONFLICT (method, snowflake) DO UPDATE SET count = totals.count + 1
+        )
+        INSERT INTO users.interactions (method, initiator, receiver) VALUES ($1, $2, $3)
+        ON CONFLICT (method, initiator, receiver) DO UPDATE
+        SET count = interactions.count + 1
+        """,
+        "execute",
+    ),
+    "games.register": Statement(
+        """
+        INSERT INTO
+            users.games
+        VALUES
+            ($1, $2, $3)
+        ON CONFLICT (game, snowflake)
+            DO UPDATE
+                SET
+                    id = $3
+        """,
+        "execute",
+    ),
+    "games.lookup": Statement("SELECT id FROM users.games WHERE game = $1 AND snowflake = $2", "fetchval"),
+}
+
+for _name, _statement in STATEMENTS.items():
+    if _statement.kind not in KINDS:
+        raise ValueError(f"Statement {_name} has an unknown kind {_statement.kind!r}")